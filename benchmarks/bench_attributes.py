@@ -0,0 +1,91 @@
+"""Rendering templates heavy in spread attributes and dynamic names.
+
+Compares memoized validation of tag and attribute names with matching the
+regexes on every render, as before, first for a single name, then for tables
+with dynamic tag and attribute names, which are validated on each render.
+Static names are validated when compiling, and the keys of spread dicts when
+compiling the writer for their shape, so neither is checked per render. Then
+compares spreading a dict with the attribute writer compiled for its keys,
+with formatting each key in turn.
+
+Run with: python benchmarks/bench_attributes.py
+"""
+
+from timeit import repeat
+
+from fdom import htmlcompiler
+from fdom.htmlcompiler import HTML, HTMLRuntimeMixin
+from fdom.htmltag import html
+
+
+class PerKeyRuntime(HTMLRuntimeMixin):
+    def get_attrs(self, value):
+        attrs = []
+        for k, v in value.items():
+            setting = self.get_key_value([k], v)
+            if setting is not None:
+                attrs.append(setting)
+        return HTML(' ' + ' '.join(attrs)) if attrs else HTML()
+
+
+def Cell(attrs, value):
+    column, state = attrs['data-column'], 'selected' if value == 0 else 'checked'
+    return html'<td {attrs} data-col-{column}={value} aria-{state}={True}>{value}</td>'
+
+
+def Row(level, attrs, cells):
+    return html'<tr {attrs}><h{level}>Row</h{level}>{[Cell(cell_attrs, value) for cell_attrs, value in cells]}</tr>'
+
+
+def Table(rows):
+    return html'<table>{[Row(n % 6 + 1, attrs, cells) for n, (attrs, cells) in enumerate(rows)]}</table>'
+
+
+def make_rows(n, columns):
+    return [
+        ({'class': 'row', 'id': f'row-{i}', 'data-index': i, 'aria-selected': i == 0},
+         [({'class': 'cell', 'data-column': j, 'data-row': i, 'hidden': False}, i * j) for j in range(columns)])
+        for i in range(n)]
+
+
+def bench(label, render, number):
+    render()  # ensure compiled
+    best = min(repeat(render, number=number, repeat=5))
+    print(f'  {label:<20} {best / number * 1e6:10.1f} us/render')
+    return best
+
+
+def main():
+    regex_tagname = htmlcompiler.is_valid_tagname.__wrapped__
+    regex_attribute_name = htmlcompiler.is_valid_attribute_name.__wrapped__
+    memo_tagname = htmlcompiler.is_valid_tagname
+    memo_attribute_name = htmlcompiler.is_valid_attribute_name
+
+    print('check one name')
+    before = bench('regex', lambda: regex_attribute_name('data-column'), 1_000_000)
+    after = bench('memoized', lambda: memo_attribute_name('data-column'), 1_000_000)
+    print(f'  {"speedup":<20} {before / after:10.2f}x')
+
+    for n, columns, number in [(10, 5, 500), (100, 10, 20)]:
+        rows = make_rows(n, columns)
+        print(f'{n} rows x {columns} columns')
+        htmlcompiler.is_valid_tagname = regex_tagname
+        htmlcompiler.is_valid_attribute_name = regex_attribute_name
+        before = bench('regex per render', lambda: Table(rows), number)
+        htmlcompiler.is_valid_tagname = memo_tagname
+        htmlcompiler.is_valid_attribute_name = memo_attribute_name
+        after = bench('memoized', lambda: Table(rows), number)
+        print(f'  {"speedup":<20} {before / after:10.2f}x')
+
+    print('get_attrs of one dict')
+    attrs = {'class': 'cell', 'id': 'cell-1', 'data-column': 3, 'hidden': False,
+             'style': {'color': 'red', 'width': '10em'}}
+    per_key, per_shape = PerKeyRuntime([]), HTMLRuntimeMixin([])
+    assert per_key.get_attrs(attrs) == per_shape.get_attrs(attrs)
+    before = bench('per key', lambda: per_key.get_attrs(attrs), 100_000)
+    after = bench('per shape writer', lambda: per_shape.get_attrs(attrs), 100_000)
+    print(f'  {"speedup":<20} {before / after:10.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Rendering one row template over many rows.
+
+Compares a loop over html, a loop over the render method of a template handle,
+and render_many.
+
+Run with: python benchmarks/bench_batch.py
+"""
+
+from timeit import repeat
+
+from fdom.htmltag import html
+from fdom.templatehandle import template
+
+
+def Row(name, quantity, price):
+    return html'<tr><td class="name">{name}</td><td>{quantity}</td><td>{price:.2f}</td></tr>'
+
+
+row = template'<tr><td class="name">{name}</td><td>{quantity}</td><td>{price:.2f}</td></tr>'
+
+
+def bench(label, render, number):
+    render()  # ensure compiled
+    best = min(repeat(render, number=number, repeat=5))
+    print(f'  {label:<16} {best / number * 1e3:10.3f} ms  {best / number / len(ROWS) * 1e6:8.3f} us/row')
+    return best
+
+
+ROWS = [(f'Item <{i}>', i, i * 1.25) for i in range(10_000)]
+
+
+def main():
+    assert ''.join(Row(*values) for values in ROWS) == row.render_many(ROWS)
+    print(f'{len(ROWS)} rows')
+    naive = bench('loop over html', lambda: ''.join([Row(*values) for values in ROWS]), 10)
+    bench('loop over render', lambda: ''.join([row.render(*values) for values in ROWS]), 10)
+    batch = bench('render_many', lambda: row.render_many(ROWS), 10)
+    print(f'  {"speedup":<16} {naive / batch:10.2f}x')
+
+
+if __name__ == '__main__':
+    main()
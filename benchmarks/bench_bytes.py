@@ -0,0 +1,69 @@
+"""Rendering a mostly static page to UTF-8, encoding the result versus html_bytes.
+
+html(...).encode() builds the whole page as a str, then encodes all of it on
+every render; html_bytes encodes only the dynamic parts, joining them with
+the static blocks, which are bytes literals in its render function.
+
+First through the tag functions, which includes looking up the template by
+call site, then the render alone, through a template handle.
+
+Run with: python benchmarks/bench_bytes.py
+"""
+
+from timeit import repeat
+
+from fdom.htmltag import html, html_bytes
+from fdom.templatehandle import template
+
+
+def Page(html, title, user):
+    return html"""<!DOCTYPE html>
+<html lang="en">
+  <head>
+    <meta charset="utf-8" />
+    <title>{title}</title>
+    <link rel="stylesheet" href="/static/css/bootstrap.min.css" />
+    <link rel="stylesheet" href="/static/css/site.css" />
+  </head>
+  <body>
+    <nav class="navbar navbar-expand-lg navbar-light bg-light">
+      <a class="navbar-brand" href="/">Café Todos</a>
+      <ul class="navbar-nav mr-auto">
+        <li class="nav-item active"><a class="nav-link" href="/home">Home</a></li>
+        <li class="nav-item"><a class="nav-link" href="/about">About</a></li>
+        <li class="nav-item"><a class="nav-link" href="/contact">Contact</a></li>
+      </ul>
+      <span class="navbar-text">Signed in as {user}</span>
+    </nav>
+    <main class="container">
+      <h1>{title}</h1>
+      <p>Everything you need to get done, brewed fresh — every single day.</p>
+    </main>
+    <footer class="footer"><p>&copy; Café Todos. All rights reserved.</p></footer>
+  </body>
+</html>"""
+
+
+def bench(label, render, number=20_000):
+    render()  # ensure compiled
+    best = min(repeat(render, number=number, repeat=5))
+    print(f'{label:<24} {best / number * 1e6:8.2f} us/render')
+    return best
+
+
+def main():
+    title, user = 'My todos', 'Zoë'
+    assert Page(html, title, user).encode() == Page(html_bytes, title, user)
+    encoded = bench('html(...).encode()', lambda: Page(html, title, user).encode())
+    direct = bench('html_bytes', lambda: Page(html_bytes, title, user))
+    print(f'{"speedup":<24} {encoded / direct:8.2f}x')
+
+    page = Page(template, title, user)
+    assert page.render(title, user, title).encode() == page.bytes(title, user, title)
+    encoded = bench('render(...).encode()', lambda: page.render(title, user, title).encode())
+    direct = bench('bytes(...)', lambda: page.bytes(title, user, title))
+    print(f'{"speedup":<24} {encoded / direct:8.2f}x')
+
+
+if __name__ == '__main__':
+    main()
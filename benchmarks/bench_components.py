@@ -0,0 +1,66 @@
+"""Rendering a page that repeats identical components with identical arguments.
+
+Compares plain components with the same components memoized, so that each
+distinct render is cached and repeated ones skip calling the component.
+
+Run with: python benchmarks/bench_components.py
+"""
+
+from timeit import repeat
+
+from fdom.components import memoize
+from fdom.htmltag import html
+
+
+def Icon(name):
+    return html'<svg class="icon icon-{name}" aria-hidden="true"><use href="#icon-{name}" /></svg>'
+
+
+def Tag(label, color):
+    return html'<span class="tag" style={ {"color": color} }>{Icon("tag")} {label}</span>'
+
+
+def Card(title, tags):
+    return html"""<article class="card">
+        <h3>{Icon("doc")} {title}</h3>
+        <footer>{[Tag(label, color) for label, color in tags]}</footer>
+    </article>"""
+
+
+MemoIcon = memoize(Icon)
+MemoTag = memoize(Tag)
+
+
+def MemoTagged(title, tags):
+    return html"""<article class="card">
+        <h3>{MemoIcon("doc")} {title}</h3>
+        <footer>{[MemoTag(label, color) for label, color in tags]}</footer>
+    </article>"""
+
+
+def Page(card, cards):
+    return html'<main>{[card(title, tags) for title, tags in cards]}</main>'
+
+
+TAGS = (('python', 'blue'), ('web', 'green'), ('perf', 'red'))
+CARDS = [(f'Post {i}', TAGS[:i % 3 + 1]) for i in range(100)]
+
+
+def bench(label, render, number):
+    render()  # ensure compiled, and cached
+    best = min(repeat(render, number=number, repeat=5))
+    print(f'  {label:<10} {best / number * 1e3:10.3f} ms/page')
+    return best
+
+
+def main():
+    assert Page(Card, CARDS) == Page(MemoTagged, CARDS)
+    print(f'{len(CARDS)} cards')
+    plain = bench('plain', lambda: Page(Card, CARDS), 50)
+    memo = bench('memoized', lambda: Page(MemoTagged, CARDS), 50)
+    print(f'  {"speedup":<10} {plain / memo:10.2f}x')
+    print(f'  {MemoTag.cache_info()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Rendering templates to a string, generator versus eager backends.
+
+The generator path is how html rendered before EagerHTMLCompiler: join the
+output of the generator compiled by HTMLCompiler. The list path appends to a
+list in a compiled render function, then joins it, as ListHTMLCompiler does.
+The eager path is fdom.htmltag.html, which builds the output with a single
+f-string in the render function.
+
+First the compiled render functions alone are timed, called with args that
+are already bound, then nested tables through the tag functions, which also
+includes looking up each template by call site.
+
+Run with: python benchmarks/bench_eager.py
+"""
+
+from timeit import repeat
+
+from fdom.htmlcompiler import EagerHTMLCompiler, HTML, HTMLCompiler, ListHTMLCompiler
+from fdom.templatecache import get_template_cache
+
+
+BACKENDS = [('generator', HTMLCompiler), ('list', ListHTMLCompiler), ('eager', EagerHTMLCompiler)]
+
+
+def capture(*args):
+    return args
+
+
+def get_html(compiler):
+    if compiler is HTMLCompiler:
+        def html(*args):
+            compiled_template, args = get_template_cache().lookup(HTMLCompiler, args)
+            return HTML(''.join(compiled_template(args)))
+    else:
+        def html(*args):
+            compiled_template, args = get_template_cache().lookup(compiler, args)
+            return compiled_template(args)
+    return html
+
+
+def Cell(html, n, value):
+    return html'<td class="value" data-n={n}>{value:.2f}</td>'
+
+
+def Row(html, n, values):
+    return html"""<tr class="row">
+        <th scope="row">Row {n}</th>
+        {[Cell(html, n, value) for value in values]}
+    </tr>"""
+
+
+def Table(html, title, rows):
+    return html"""<table>
+        <caption>{title}</caption>
+        <tbody>{[Row(html, n, values) for n, values in enumerate(rows)]}</tbody>
+    </table>"""
+
+
+def bench(label, render, number):
+    render()  # ensure compiled
+    best = min(repeat(render, number=number, repeat=5))
+    print(f'  {label:<10} {best / number * 1e6:10.2f} us/render')
+    return best
+
+
+def bench_backends(render, number):
+    times = {label: bench(label, render(compiler), number) for label, compiler in BACKENDS}
+    print(f'  speedup    {times["generator"] / times["eager"]:10.2f}x over generator, '
+          f'{times["list"] / times["eager"]:.2f}x over list')
+
+
+def render_only(args):
+    def render(compiler):
+        compiled_template, bound_args = get_template_cache().lookup(compiler, args)
+        if compiler is HTMLCompiler:
+            return lambda: HTML(''.join(compiled_template(bound_args)))
+        return lambda: compiled_template(bound_args)
+    return render
+
+
+def main():
+    label, item = 'High', 'Get milk & eggs'
+    title, body, href = 'Groceries', 'For the weekend', '/lists/groceries'
+    print('render only: item')
+    bench_backends(render_only(capture'<li class="todo">{label}: {item}</li>'), 100_000)
+    print('render only: card')
+    bench_backends(render_only(capture"""<div class="card">
+        <h2>{title}</h2>
+        <p>{body}</p>
+        <a href={href}>{label}</a>
+    </div>"""), 100_000)
+
+    for rows, columns, number in [(1, 1, 20_000), (10, 5, 1_000), (100, 10, 50)]:
+        data = [[n * 1.5 + i for i in range(columns)] for n in range(rows)]
+        assert len({Table(get_html(compiler), 'Data', data) for _, compiler in BACKENDS}) == 1
+        print(f'{rows} rows x {columns} columns')
+        bench_backends(lambda compiler: lambda: Table(get_html(compiler), 'Data', data), number)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Rendering a sidebar that changes rarely, with and without a fragment cache.
+
+Run with: python benchmarks/bench_fragmentcache.py
+"""
+
+from tempfile import TemporaryDirectory
+from timeit import repeat
+
+from fdom.fragmentcache import FileBackend, FragmentCache
+from fdom.htmltag import html
+from fdom.templatehandle import template
+
+
+def Link(href, label, count):
+    return html'<li><a href={href}>{label}</a> <span class="count">{count:,}</span></li>'
+
+
+def Section(title, links):
+    return html'<section><h3>{title}</h3><ul>{[Link(*link) for link in links]}</ul></section>'
+
+
+sidebar = template'<aside class="sidebar">{[Section(title, links) for title, links in sections]}</aside>'
+
+SECTIONS = [
+    (f'Section {i}', [(f'/section/{i}/{j}', f'Link {j}', i * j * 1000) for j in range(10)])
+    for i in range(5)]
+
+
+def bench(label, render, number):
+    render()  # ensure compiled, and cached
+    best = min(repeat(render, number=number, repeat=5)) / number
+    print(f'  {label:<10} {best * 1e6:10.1f} us/render')
+    return best
+
+
+def main():
+    memory = FragmentCache()
+    with TemporaryDirectory() as directory:
+        files = FragmentCache(FileBackend(directory))
+        expected = sidebar.render(SECTIONS)
+        assert memory.render(sidebar, SECTIONS, key='sidebar') == files.render(sidebar, SECTIONS, key='sidebar') == expected
+        plain = bench('render', lambda: sidebar.render(SECTIONS), 200)
+        cached = bench('memory', lambda: memory.render(sidebar, SECTIONS, key='sidebar'), 20_000)
+        on_disk = bench('file', lambda: files.render(sidebar, SECTIONS, key='sidebar'), 2_000)
+    print(f'  {"speedup":<10} {plain / cached:10.1f}x memory, {plain / on_disk:.1f}x file')
+
+
+if __name__ == '__main__':
+    main()
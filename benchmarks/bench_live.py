@@ -0,0 +1,55 @@
+"""Updating a dashboard where one value changes on each refresh.
+
+Compares rendering the whole template again through its handle, with
+updating a live render, which renders only the parts using changed values.
+
+Run with: python benchmarks/bench_live.py
+"""
+
+from timeit import repeat
+
+from fdom.templatehandle import template
+
+
+panel = template"""<section class="dashboard">
+    <h2>{title}</h2>
+    <dl class="metrics">
+        <dt>Requests</dt><dd class={requests_status}>{requests:,}</dd>
+        <dt>Errors</dt><dd class={errors_status}>{errors:,}</dd>
+        <dt>Latency</dt><dd>{latency:.1f} ms</dd>
+        <dt>Queue</dt><dd>{queue}</dd>
+    </dl>
+    <ul class="hosts">{hosts}</ul>
+    <footer>Updated {updated}</footer>
+</section>"""
+
+
+def make_values(tick, hosts):
+    return ('Service health', 'ok', 1_000_000, 'ok', 12, 48.25, 3, hosts, f'tick {tick}')
+
+
+def main():
+    for n, number in [(10, 5_000), (200, 500)]:
+        hosts = [f'host-{i}.example.com' for i in range(n)]
+        ticks = [make_values(tick, hosts) for tick in range(number)]
+        live = panel.live(*ticks[0])
+        assert live.update(*ticks[1]) == panel.render(*ticks[1])
+        print(f'{n} hosts')
+
+        def render_all():
+            for values in ticks:
+                panel.render(*values)
+
+        def update_all():
+            for values in ticks:
+                live.update(*values)
+
+        full = min(repeat(render_all, number=1, repeat=5)) / number
+        print(f'  {"render":<16} {full * 1e6:10.1f} us/refresh')
+        partial = min(repeat(update_all, number=1, repeat=5)) / number
+        print(f'  {"live update":<16} {partial * 1e6:10.1f} us/refresh')
+        print(f'  {"speedup":<16} {full / partial:10.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Parse throughput of ASTParser versus the HTMLParser based reference parser.
+
+Run with: python benchmarks/bench_parser.py
+"""
+
+from timeit import repeat
+
+from fdom.astparser import ASTParser, HTMLParserASTParser, make_key
+
+
+def keyed(*args):
+    return make_key(*args)
+
+
+def parse(parser_class, keyed_args):
+    parser = parser_class()
+    for i, arg in enumerate(keyed_args):
+        parser.feed(i, arg)
+    return parser.result()
+
+
+def row(n):
+    label, value, attrs = 'label', 'value', {}
+    return keyed"""<tr class="row-{n}" {attrs}>
+        <td class="label"><a href="/items/{n}" title="Item {label}">{label}</a></td>
+        <td class="value" data-value={value}>{value:.2f} &amp; more</td>
+    </tr>"""
+
+
+def bench(label, keyed_args, number):
+    size = sum(len(arg) for arg in keyed_args if isinstance(arg, str))
+    print(f'{label} ({len(keyed_args)} args, {size} chars)')
+    for parser_class in (HTMLParserASTParser, ASTParser):
+        best = min(repeat(lambda: parse(parser_class, keyed_args), number=number, repeat=5))
+        print(f'  {parser_class.__name__:<22} {best / number * 1e6:10.1f} us/parse  '
+              f'{size * number / best / 1e6:6.2f} Mchars/s')
+
+
+def main():
+    title = 'title'
+    small = keyed'<h1 class="title">{title}</h1>'
+    bench('small', small, 10_000)
+
+    # A large template, as one table with many interpolated rows
+    rows = row(0)
+    large = (rows[0].__class__('<table>'),) + rows * 200 + (rows[0].__class__('</table>'),)
+    bench('large', tuple(large), 20)
+
+
+if __name__ == '__main__':
+    main()
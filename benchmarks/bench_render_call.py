@@ -0,0 +1,64 @@
+"""Per-render overhead of calling a compiled template.
+
+Small templates, where the cost of calling the renderer itself dominates,
+rendered with each tag function and through a template handle. Then just the
+call of a compiled template, with its args already bound.
+
+Run with: python benchmarks/bench_render_call.py
+"""
+
+from timeit import repeat
+
+from fdom.htmlcompiler import EagerHTMLCompiler
+from fdom.htmltag import html, html_bytes, html_iter
+from fdom.templatecache import get_template_cache
+from fdom.templatehandle import template
+
+
+def Static():
+    return html'<hr class="divider" />'
+
+
+def Link(href, label):
+    return html'<a href={href}>{label}</a>'
+
+
+def LinkBytes(href, label):
+    return html_bytes'<a href={href}>{label}</a>'
+
+
+def LinkIter(href, label):
+    return ''.join(html_iter'<a href={href}>{label}</a>')
+
+
+link = template'<a href={href}>{label}</a>'
+
+
+def capture(*args):
+    return args
+
+
+def bound_link(href, label):
+    return get_template_cache().lookup(EagerHTMLCompiler, capture'<a href={href}>{label}</a>')
+
+
+def bench(label, render, number):
+    render()  # ensure compiled
+    best = min(repeat(render, number=number, repeat=5))
+    print(f'  {label:<16} {best / number * 1e9:10.0f} ns/render')
+    return best
+
+
+def main():
+    number = 200_000
+    bench('html static', Static, number)
+    bench('html', lambda: Link('/about', 'About'), number)
+    bench('html_bytes', lambda: LinkBytes('/about', 'About'), number)
+    bench('html_iter', lambda: LinkIter('/about', 'About'), number)
+    bench('template.render', lambda: link.render('/about', 'About'), number)
+    compiled_template, args = bound_link('/about', 'About')
+    bench('compiled call', lambda: compiled_template(args), number)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Per-call overhead of looking up a compiled template on a cache hit.
+
+Compares the full keying path (convert_to_proposed_scheme, make_key, then the
+keyed lookup in compile_template) with the call site identity cache used by
+fdom.htmltag.html. Also times a cold start, where many threads render the
+same templates at once, counting the compilations done.
+
+Run with: python benchmarks/bench_template_cache.py
+"""
+
+import threading
+from time import perf_counter
+from timeit import repeat
+
+from fdom.astparser import make_key
+from fdom.htmlcompiler import HTMLCompiler
+from fdom.htmltag import compile_template
+from fdom.taglib import convert_to_proposed_scheme
+from fdom.instrument import add_compile_listener, remove_compile_listener
+from fdom.templatecache import TemplateCache, get_template_cache
+
+
+def capture(*args):
+    return args
+
+
+def keyed_lookup(args):
+    args = convert_to_proposed_scheme(*args)
+    return compile_template(*make_key(*args)), args
+
+
+def site_lookup(args):
+    return get_template_cache().lookup(HTMLCompiler, args)
+
+
+def bench(label, lookup, args, number=100_000):
+    lookup(args)  # ensure compiled
+    best = min(repeat(lambda: lookup(args), number=number, repeat=5))
+    print(f'{label:<40} {best / number * 1e6:8.3f} us/call')
+
+
+def cold_start(templates, threads=16):
+    cache = TemplateCache()
+    compiled = []
+    listener = add_compile_listener(compiled.append)
+    barrier = threading.Barrier(threads)
+
+    def request():
+        barrier.wait()
+        for args in templates:
+            cache.lookup(HTMLCompiler, args)
+
+    workers = [threading.Thread(target=request) for _ in range(threads)]
+    start = perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = perf_counter() - start
+    remove_compile_listener(listener)
+    print(f'cold start: {threads} threads x {len(templates)} templates  '
+          f'{elapsed * 1e3:8.3f} ms, {len(compiled)} compilations')
+
+
+def main():
+    label, item = 'High', 'Get milk & eggs'
+    small = capture'<li class="todo">{label}: {item}</li>'
+    large = capture"""<nav class="navbar navbar-expand-lg navbar-light bg-light">
+          <a class="navbar-brand" href="/">{label}</a>
+          <ul class="navbar-nav mr-auto">
+            <li class="nav-item active"><a class="nav-link" href="/home">Home</a></li>
+            <li class="nav-item"><a class="nav-link" href="/about">{item}</a></li>
+          </ul>
+        </nav>"""
+
+    for name, args in [('small', small), ('large', large)]:
+        bench(f'{name}: make_key + keyed lookup', keyed_lookup, args)
+        bench(f'{name}: call site identity cache', site_lookup, args)
+    cold_start([small, large])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Throughput of HTMLRuntimeMixin.unpack_value for common shapes of value.
+
+Compares the current implementation with the previous recursive one, which
+dispatched every value through the same match and recursed with yield from
+for each element of an iterable.
+
+Run with: python benchmarks/bench_unpack_value.py
+"""
+
+from collections.abc import Iterable
+from html import escape
+from timeit import repeat
+
+from fdom.htmlcompiler import HTML, HTMLRuntimeMixin
+
+
+class RecursiveRuntime(HTMLRuntimeMixin):
+    def unpack_value(self, value, fspec) -> Iterable[HTML]:
+        match value:
+            case HTML():
+                yield value
+            case str():
+                yield HTML(escape(format(value, fspec)))
+            case Iterable():
+                for elem in value:
+                    yield from self.unpack_value(elem, fspec)
+            case _:
+                yield HTML(escape(format(value, fspec)))
+
+
+SHAPES = [
+    ('str', 'Get milk & eggs', ''),
+    ('int', 42, ''),
+    ('float with spec', 3.14159, '.2f'),
+    ('1000 strs', [f'item <{i}>' for i in range(1000)], ''),
+    ('1000 HTML', [HTML(f'<li>{i}</li>') for i in range(1000)], ''),
+    ('1000 ints', list(range(1000)), ''),
+    ('100 x 10 nested', [[f'<td>{i}</td>', HTML('<br>'), i] * 3 for i in range(100)], ''),
+]
+
+
+def bench(runtime, value, fspec, number):
+    return min(repeat(lambda: ''.join(runtime.unpack_value(value, fspec)), number=number, repeat=5))
+
+
+def main():
+    current, recursive = HTMLRuntimeMixin([]), RecursiveRuntime([])
+    print(f'{"shape":<18} {"recursive":>12} {"current":>12} {"speedup":>8}')
+    for label, value, fspec in SHAPES:
+        assert ''.join(current.unpack_value(value, fspec)) == ''.join(recursive.unpack_value(value, fspec))
+        number = 200 if isinstance(value, list) else 100_000
+        before = bench(recursive, value, fspec, number)
+        after = bench(current, value, fspec, number)
+        print(f'{label:<18} {before / number * 1e6:9.2f} us {after / number * 1e6:9.2f} us {before / after:7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Updating a large page rendered with the fdom backend.
+
+After changing one row, compares serializing the whole new render, as a page
+without a virtual DOM would be sent again, with diffing it against the old
+render and patching that. Rendering itself is the same for both.
+
+Run with: python benchmarks/bench_vdom.py
+"""
+
+from timeit import repeat
+
+from fdom.fdom_htmltag import html
+from fdom.vdom import diff, patch, to_html
+
+
+def Row(id, name, price):
+    return html"""<tr key={id}>
+        <td class="name">{name}</td>
+        <td class="price">{price:.2f}</td>
+        <td class="actions"><button class="edit">Edit</button> <button class="delete">Delete</button></td>
+    </tr>"""
+
+
+def Table(rows):
+    return html"""<table class="products">
+        <thead><tr><th>Name</th><th>Price</th><th>Actions</th></tr></thead>
+        <tbody>{[Row(*row) for row in rows]}</tbody>
+    </table>"""
+
+
+def bench(label, run, number):
+    best = min(repeat(run, number=number, repeat=5))
+    print(f'  {label:<16} {best / number * 1e3:10.3f} ms')
+    return best
+
+
+def main():
+    for n, number in [(100, 200), (1000, 20)]:
+        rows = [(i, f'Item {i}', i * 1.25) for i in range(n)]
+        changed = rows.copy()
+        changed[n // 2] = (n // 2, 'Changed', 0.5)
+        old = Table(rows)
+        new = Table(changed)
+        print(f'{n} rows, one changed')
+        bench('render', lambda: Table(changed), number)
+        full = bench('to_html', lambda: to_html(new), number)
+        changes = diff(Table(rows), new)
+        print(f'  {"changes":<16} {len(changes):10d}')
+        partial = bench('diff', lambda: diff(old, new), number)
+        print(f'  {"speedup":<16} {full / partial:10.2f}x')
+        patch(diff(old, new))
+        assert to_html(old) == to_html(new)
+
+
+if __name__ == '__main__':
+    main()
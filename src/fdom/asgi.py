@@ -0,0 +1,68 @@
+from collections.abc import AsyncIterable, Awaitable, Callable, Iterable
+
+from fdom.htmlcompiler import DEFAULT_CHUNK_SIZE, FLUSH
+
+
+"""
+Streaming rendered HTML as an ASGI response.
+
+    async def app(scope, receive, send):
+        await send_html(send, html_aiter'<ul>{rows_from_db()}</ul>')
+
+The response starts as soon as send_html is called, and output is then sent
+in chunks of roughly chunk_size characters. Renderers from html_aiter also
+yield FLUSH before waiting on an awaitable or async iterable, at which point
+any output so far is sent, so a slow data source does not hold back the rest
+of the page.
+"""
+
+
+async def send_html(
+        send: Callable[[dict], Awaitable[None]],
+        fragment: AsyncIterable[str] | Iterable[str],
+        *,
+        status: int = 200,
+        headers: Iterable[tuple[bytes, bytes]] = (),
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        encoding: str = 'utf-8') -> None:
+    """Send fragment, eg from html_aiter or html_iter, as an HTTP response"""
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', f'text/html; charset={encoding}'.encode()), *headers],
+    })
+
+    buffer = []
+    size = 0
+
+    async def flush():
+        nonlocal buffer, size
+        body = ''.join(buffer).encode(encoding)
+        buffer = []
+        size = 0
+        await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+    async for part in _aiter(fragment):
+        if part is FLUSH:
+            if buffer:
+                await flush()
+            continue
+        buffer.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            await flush()
+
+    await send({
+        'type': 'http.response.body',
+        'body': ''.join(buffer).encode(encoding),
+        'more_body': False,
+    })
+
+
+async def _aiter(fragment: AsyncIterable[str] | Iterable[str]) -> AsyncIterable[str]:
+    if isinstance(fragment, AsyncIterable):
+        async for part in fragment:
+            yield part
+    else:
+        for part in fragment:
+            yield part
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import re
 from collections import deque
 from dataclasses import dataclass, field
+from html import unescape
 from html.parser import HTMLParser
-from typing import Literal, NamedTuple
+from typing import Iterable, Literal, NamedTuple
 
 from fdom.taglib import Chunk, Thunk, convert_to_proposed_scheme
 
@@ -37,13 +39,79 @@ class Interpolation(NamedTuple):
 
 # FIXME there must be a better name for this. Elements? Expando?
 
-E = list[str, Interpolation]
+E = tuple[str | Interpolation, ...]
+
 
-@dataclass
 class Tag:
-    tagname: E = None
-    attrs: list[tuple[E, E | None]] = field(default_factory=list)
-    children: list[str, Interpolation, 'Tag'] = field(default_factory=list)
+    """Immutable element of a parsed template; tagname is None for the root
+    of a template with multiple top level nodes.
+
+    Flags are precomputed for the compilers: static_tagname if the tagname has
+    no interpolations, has_interpolations if this element's own tagname, attrs
+    or children do, and static if there are none anywhere in its subtree.
+    """
+
+    __slots__ = ('tagname', 'attrs', 'children', 'static_tagname', 'has_interpolations', 'static')
+    __match_args__ = ('tagname', 'attrs', 'children')
+
+    tagname: E | None
+    attrs: tuple[tuple[E, E | None], ...]
+    children: tuple[str | Interpolation | Tag, ...]
+
+    def __init__(self, tagname: Iterable[str | Interpolation] | None = None,
+                 attrs: Iterable[tuple[Iterable[str | Interpolation], Iterable[str | Interpolation] | None]] = (),
+                 children: Iterable[str | Interpolation | Tag] = ()):
+        tagname = None if tagname is None else tuple(tagname)
+        attrs = tuple((tuple(k), None if v is None else tuple(v)) for k, v in attrs)
+        children = tuple(children)
+
+        static_tagname = tagname is not None and len(tagname) == 1 and tagname[0].__class__ is not Interpolation
+        has_interpolations = (
+            not static_tagname and tagname is not None
+            or any(
+                part.__class__ is Interpolation
+                for k, v in attrs for part in (k if v is None else k + v))
+            or any(child.__class__ is Interpolation for child in children))
+        static = not has_interpolations and all(
+            child.static for child in children if child.__class__ is Tag)
+
+        setattr = super().__setattr__
+        setattr('tagname', tagname)
+        setattr('attrs', attrs)
+        setattr('children', children)
+        setattr('static_tagname', static_tagname)
+        setattr('has_interpolations', has_interpolations)
+        setattr('static', static)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{self.__class__.__name__} is immutable')
+
+    __delattr__ = __setattr__
+
+    def __eq__(self, other):
+        if other.__class__ is not Tag:
+            return NotImplemented
+        return (self.tagname, self.attrs, self.children) == (other.tagname, other.attrs, other.children)
+
+    def __hash__(self):
+        return hash((self.tagname, self.attrs, self.children))
+
+    def __repr__(self):
+        return f'Tag(tagname={self.tagname!r}, attrs={self.attrs!r}, children={self.children!r})'
+
+
+# Parsers build the tree with these mutable nodes, then freeze it
+
+@dataclass
+class TagBuilder:
+    tagname: list[str | Interpolation] | None = None
+    attrs: list[tuple[list[str | Interpolation], list[str | Interpolation] | None]] = field(default_factory=list)
+    children: list[str | Interpolation | TagBuilder] = field(default_factory=list)
+
+    def freeze(self) -> Tag:
+        return Tag(self.tagname, self.attrs, [
+            child.freeze() if child.__class__ is TagBuilder else child
+            for child in self.children])
 
 
 # Normalizes thunks such that they are suitable for keys, that is regardless of
@@ -79,6 +147,334 @@ def as_ast(*args: Chunk | Thunk) -> Tag:
     return parse_keyed_template_as_ast(*make_key(*args))
 
 
+def is_static_element(tagname: E) -> bool:
+    match tagname:
+        case [str()]:
+            return True
+        case _:
+            return False
+
+
+# ASTParser tokenizes the template in a single pass over its segments, the
+# decoded chunks and the interpolations between them, so interpolations are
+# never rendered into text and found again. Within a chunk, scanning is done
+# with the regexes below, each of which stops at the end of the chunk; an
+# interpolation may then continue a name or value, as in <h{level}> or
+# class="item {extra}".
+#
+# Its behavior follows HTMLParser as used by HTMLParserASTParser: tag and
+# attribute names are lowercased, character references are unescaped in data
+# and attribute values (except within script and style), and comments and
+# declarations are dropped.
+#
+# Currently checking that end tags match start tags is only done on static tag
+# names, that is they do not contain interpolations. If they do contain
+# interpolations, this would have to be done as constraints that are checked
+# when rendering the template.
+
+tagname_text_re = re.compile(r'[^\s/>]*')
+endtagname_text_re = re.compile(r'[^\s>]*')
+attribute_name_text_re = re.compile(r'[^\s/>=]*')
+unquoted_value_text_re = re.compile(r'[^\s>]*')
+attribute_space_re = re.compile(r'(?:\s|/(?!>))*')
+attribute_equals_re = re.compile(r'\s*=\s*')
+
+# Fast paths for the common case of tags without interpolations, which are
+# entirely within one chunk
+static_starttag_re = re.compile(r"""
+    <([a-zA-Z][^\s/>]*+)
+    ((?>(?:\s|/(?!>))++[^\s/>=]++(?:\s*+=\s*+(?:"[^"]*+"|'[^']*+'|(?!['"])[^>\s]*+))?)*+)
+    (?:\s|/(?!>))*+(/?)>""", re.VERBOSE)
+static_attribute_re = re.compile(r"""
+    (?:\s|/(?!>))*([^\s/>=]+)(?:\s*(=)\s*("[^"]*"|'[^']*'|(?!['"])[^>\s]*))?""", re.VERBOSE)
+static_endtag_re = re.compile(r'</([a-zA-Z][^\s>]*)[^>]*>')
+
+CDATA_CONTENT_ELEMENTS = ('script', 'style')
+
+
+class ASTParser:
+    def __init__(self):
+        self.root = TagBuilder()
+        self.stack: list[TagBuilder] = [self.root]
+        self.segments: list[str | Interpolation] = []
+        self.i = 0  # index of the current segment
+        self.pos = 0  # position within the current segment, if a str
+
+    def feed(self, index: int, data: Chunk | KeyThunk) -> None:
+        match data:
+            case Chunk() as c:
+                self.segments.append(c.decoded)
+            case KeyThunk() as t:
+                self.segments.append(Interpolation(index, t.conv, t.formatspec))
+
+    def result(self) -> Tag:
+        self.parse()
+        match self.root.children:
+            case []:
+                raise ValueError('Nothing to return')
+            case [TagBuilder() as child]:
+                return child.freeze()
+            case [child]:
+                return child
+            case _:
+                return self.root.freeze()
+
+    def current(self) -> str | Interpolation | None:
+        """Return the current segment, skipping past any fully consumed str"""
+        segments = self.segments
+        while self.i < len(segments):
+            segment = segments[self.i]
+            if segment.__class__ is not Interpolation and self.pos >= len(segment):
+                self.i += 1
+                self.pos = 0
+            else:
+                return segment
+        return None
+
+    def advance(self) -> None:
+        """Move past the current interpolation"""
+        self.i += 1
+        self.pos = 0
+
+    def parse(self) -> None:
+        while (segment := self.current()) is not None:
+            if segment.__class__ is Interpolation:
+                self.stack[-1].children.append(segment)
+                self.advance()
+                continue
+
+            pos = self.pos
+            lt = segment.find('<', pos)
+            if lt == -1:
+                self.add_data(segment[pos:])
+                self.pos = len(segment)
+                continue
+            if lt > pos:
+                self.add_data(segment[pos:lt])
+            self.pos = lt
+            self.parse_markup(segment, lt)
+
+    def add_data(self, data: str) -> None:
+        if '&' in data:
+            data = unescape(data)
+        children = self.stack[-1].children
+        if children and children[-1].__class__ is str:
+            children[-1] += data
+        else:
+            children.append(data)
+
+    def at_interpolation(self, segment: str, pos: int) -> bool:
+        """Whether an interpolation immediately follows position pos"""
+        return (
+            pos == len(segment) and self.i + 1 < len(self.segments)
+            and self.segments[self.i + 1].__class__ is Interpolation)
+
+    def parse_markup(self, segment: str, lt: int) -> None:
+        # segment[lt] is '<'
+        if m := static_starttag_re.match(segment, lt):
+            self.pos = m.end()
+            self.parse_static_starttag(m)
+            return
+        if m := static_endtag_re.match(segment, lt):
+            self.pos = m.end()
+            self.end_tag([m[1].lower()])
+            return
+
+        start = self.i
+        next_char = segment[lt + 1:lt + 2]
+        if next_char.isascii() and next_char.isalpha() or self.at_interpolation(segment, lt + 1):
+            self.pos = lt + 1
+            complete = self.parse_starttag()
+        elif next_char == '/':
+            after = segment[lt + 2:lt + 3]
+            self.pos = lt + 2
+            if after.isascii() and after.isalpha() or self.at_interpolation(segment, lt + 2):
+                complete = self.parse_endtag()
+            else:
+                complete = self.skip_past('>')
+        elif segment.startswith('<!--', lt):
+            self.pos = lt + 4
+            complete = self.skip_past('-->')
+        elif segment.startswith('<![CDATA[', lt):
+            self.pos = lt + 9
+            complete = self.skip_past(']]>')
+        elif next_char in ('!', '?'):
+            self.pos = lt + 2
+            complete = self.skip_past('>')
+        else:
+            complete = False
+
+        if not complete:
+            # As with HTMLParser, markup that is not closed is just data
+            self.i = start
+            self.pos = lt + 1
+            self.add_data('<')
+
+    def skip_past(self, terminator: str) -> bool:
+        """Skip over comments and declarations, including any interpolations"""
+        while (segment := self.current()) is not None:
+            if segment.__class__ is Interpolation:
+                self.advance()
+                continue
+            end = segment.find(terminator, self.pos)
+            if end == -1:
+                self.pos = len(segment)
+            else:
+                self.pos = end + len(terminator)
+                return True
+        return False
+
+    def read_name(self, text_re: re.Pattern, lower: bool = True) -> E:
+        """Read text matching text_re, plus any interpolations, as expanded parts"""
+        parts = []
+        while (segment := self.current()) is not None:
+            if segment.__class__ is Interpolation:
+                parts.append(segment)
+                self.advance()
+                continue
+            m = text_re.match(segment, self.pos)
+            text = m.group()
+            if text:
+                if lower:
+                    text = text.lower()
+                if parts and parts[-1].__class__ is str:
+                    parts[-1] += text
+                else:
+                    parts.append(text)
+            self.pos = m.end()
+            if self.pos < len(segment):
+                # Stopped at a delimiter
+                break
+        return parts
+
+    def read_quoted_value(self, quote: str) -> E:
+        parts = []
+        while (segment := self.current()) is not None:
+            if segment.__class__ is Interpolation:
+                parts.append(segment)
+                self.advance()
+                continue
+            end = segment.find(quote, self.pos)
+            text = segment[self.pos:] if end == -1 else segment[self.pos:end]
+            if text:
+                if '&' in text:
+                    text = unescape(text)
+                parts.append(text)
+            if end != -1:
+                self.pos = end + 1
+                break
+            self.pos = len(segment)
+        return parts or ['']
+
+    def skip(self, skip_re: re.Pattern) -> str | None:
+        """Skip text matching skip_re, returning the next character if any"""
+        segment = self.current()
+        if segment is None:
+            return None
+        if segment.__class__ is Interpolation:
+            return ''
+        self.pos = skip_re.match(segment, self.pos).end()
+        if self.pos < len(segment):
+            return segment[self.pos]
+        # Continue with any following chunk
+        return self.skip(skip_re)
+
+    def parse_static_starttag(self, m: re.Match) -> None:
+        tagname = [m[1].lower()]
+        attrs = []
+        for name, equals, value in static_attribute_re.findall(m[2]):
+            if not equals:
+                attrs.append(([name.lower()], None))
+                continue
+            if value[:1] in ('"', "'"):
+                value = value[1:-1]
+            attrs.append(([name.lower()], [unescape(value) if '&' in value else value]))
+        self.start_tag(tagname, attrs)
+        if m[3]:
+            self.end_tag(tagname)
+        elif tagname[0] in CDATA_CONTENT_ELEMENTS:
+            self.parse_cdata(tagname[0])
+
+    def parse_starttag(self) -> bool:
+        tagname = self.read_name(tagname_text_re)
+        attrs = []
+        while True:
+            match self.skip(attribute_space_re):
+                case None:
+                    return False
+                case '>':
+                    self.pos += 1
+                    break
+                case '/':
+                    # Only a / immediately before > is not skipped, so is self closing
+                    self.pos += 2
+                    self.start_tag(tagname, attrs)
+                    self.end_tag(tagname)
+                    return True
+            name = self.read_name(attribute_name_text_re)
+            if not name:
+                # A stray =, which HTMLParser would include in the name
+                name = ['=']
+                self.pos += 1
+            value = None
+            segment = self.current()
+            if segment.__class__ is str:
+                m = attribute_equals_re.match(segment, self.pos)
+                if m:
+                    self.pos = m.end()
+                    match self.skip(attribute_space_re):
+                        case '"' | "'" as quote:
+                            self.pos += 1
+                            value = self.read_quoted_value(quote)
+                        case _:
+                            value = self.read_name(unquoted_value_text_re, lower=False)
+                            value = [unescape(v) if v.__class__ is str and '&' in v else v for v in value] or ['']
+            attrs.append((name, value))
+
+        self.start_tag(tagname, attrs)
+        if is_static_element(tagname) and tagname[0] in CDATA_CONTENT_ELEMENTS:
+            self.parse_cdata(tagname[0])
+        return True
+
+    def parse_cdata(self, tagname: str) -> None:
+        """Content of script and style is not parsed, nor unescaped"""
+        end_re = re.compile(f'</{tagname}(?=[\\s/>])', re.IGNORECASE)
+        children = self.stack[-1].children
+        while (segment := self.current()) is not None:
+            if segment.__class__ is Interpolation:
+                children.append(segment)
+                self.advance()
+                continue
+            m = end_re.search(segment, self.pos)
+            end = len(segment) if m is None else m.start()
+            if end > self.pos:
+                children.append(segment[self.pos:end])
+            self.pos = end
+            if m is not None:
+                return
+
+    def parse_endtag(self) -> bool:
+        tagname = self.read_name(endtagname_text_re)
+        if not self.skip_past('>'):
+            return False
+        self.end_tag(tagname)
+        return True
+
+    def start_tag(self, tagname: E, attrs: list[tuple[E, E | None]]) -> None:
+        this_node = TagBuilder(tagname, attrs)
+        self.stack[-1].children.append(this_node)
+        self.stack.append(this_node)
+
+    def end_tag(self, tagname: E) -> None:
+        if len(self.stack) == 1:
+            raise ValueError(f'Unexpected end tag {tagname!r}')
+        node = self.stack.pop()
+        if is_static_element(tagname) and is_static_element(node.tagname):
+            if tagname != node.tagname:
+                raise ValueError(f'Start tag {node.tagname[0]!r} does not match end tag {tagname[0]!r}')
+        # FIXME otherwise handle as a constraint - this needs to be added to the parsed result
+
+
 # We choose this symbol because, after replacing all $ with $$, there is no way for a
 # user to feed a string that would result in x$x. Thus we can reliably split an HTML
 # data string on x$x. We also choose this because, the HTML parse looks for tag names
@@ -94,30 +490,21 @@ def unescape_placeholder(string: str) -> str:
     return string.replace('$$', '$')
 
 
-def is_static_element(tagname: E) -> bool:
-    match tagname:
-        case [str()]:
-            return True
-        case _:
-            return False
-
-
+# The original parser, built on html.parser.HTMLParser by feeding it placeholders
+# for interpolations, then splitting them back out of tag names, attributes and
+# data. It is kept as a reference implementation for comparing with ASTParser.
+#
 # Per the docs on HTMLParser:
 #
 # "This parser does not check that end tags match start tags or call the
 # end-tag handler for elements which are closed implicitly by closing an
 # outer element."
-#
-# Currently this checking is only done on static tag names, that is
-# they do not contain interpolations. If they do contain interpolations,
-# this would have to be done as constraints that are checked when
-# rendering the template.
 
-class ASTParser(HTMLParser):
+class HTMLParserASTParser(HTMLParser):
     def __init__(self):
         super().__init__()
-        self.root = Tag()
-        self.stack: list[Tag] = [self.root]
+        self.root = TagBuilder()
+        self.stack: list[TagBuilder] = [self.root]
         self.interpolations: deque[Interpolation] = deque()
 
     def feed(self, index: int, data: Chunk | KeyThunk) -> None:
@@ -133,10 +520,12 @@ class ASTParser(HTMLParser):
         match self.root.children:
             case []:
                 raise ValueError('Nothing to return')
+            case [TagBuilder() as child]:
+                return child.freeze()
             case [child]:
                 return child
             case _:
-                return self.root
+                return self.root.freeze()
 
     def expand_interpolations(self, s: str | None) -> E | None:
         if s is None:
@@ -170,7 +559,7 @@ class ASTParser(HTMLParser):
         # At this point all interpolated values should have been consumed, and therefore a bug in this class.
         assert not self.interpolations, 'Did not interpolate all values'
 
-        this_node = Tag(expanded_tagname, expanded_attrs)
+        this_node = TagBuilder(expanded_tagname, expanded_attrs)
         last_node = self.stack[-1]
         last_node.children.append(this_node)
         self.stack.append(this_node)
@@ -1,5 +1,6 @@
 from functools import lru_cache
 from textwrap import dedent
+from types import CodeType
 from typing import Callable
 
 from fdom.astparser import make_key, parse_keyed_template_as_ast, Tag
@@ -21,12 +22,18 @@ class BaseCompiler:
         self.lines.append(f"{indentation}{line}")
 
     def __call__(self, tag: Tag) -> Callable:
-        print("AST:\n", tag)
+        return self.load(self.generate(tag))
+
+    def generate(self, tag: Tag) -> CodeType:
         self.compile(tag)
-        print("Compiled code:\n", self.code)
+        return compile(self.code, "<string>", "exec")
 
-        # standard boilerplate to compile a string into a callable
-        code_obj = compile(self.code, "<string>", "exec")
+    def load(self, code_obj: CodeType) -> Callable:
+        # standard boilerplate to turn compiled code into a callable; the
+        # code object may also come from a persistent cache
         captured = {}
         exec(code_obj, captured)
-        return captured[self.name]
+        return self.bind(captured[self.name])
+
+    def bind(self, function: Callable) -> Callable:
+        return function
@@ -0,0 +1,72 @@
+from collections.abc import Hashable
+from threading import Lock
+from typing import Callable, NamedTuple, TypeVar
+
+
+"""
+Parts shared by the caches of fdom.
+
+typed_key keys a cache on arguments, as lru_cache(typed=True) does, for caches
+of rendered output, since equal values may render differently, eg 1 and True,
+or HTML and the str it is equal to.
+
+CacheInfo holds the statistics of any of them, in the order of those of
+functools.lru_cache, followed by those that only some caches keep.
+
+SingleFlight computes a missing entry once per key at a time, eg compiling a
+template, or rendering a fragment, that many threads miss on at once, such as
+just after a deploy. The first thread computes it, while the others wait for
+it to finish, then find the entry it stored.
+"""
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int | None = None
+    currsize: int | None = None
+    evictions: int = 0
+    expired: int = 0
+    compile_time: float = 0.0  # total seconds spent compiling, for templates
+
+
+# Separates positional from keyword arguments in keys
+_kwargs_mark = object()
+
+
+def typed_key(args: tuple, kwargs: dict | None = None) -> tuple:
+    """Key of args and kwargs, plus the class of each of their values"""
+    key = args + (_kwargs_mark, *kwargs.items()) if kwargs else args
+    key += tuple([v.__class__ for v in args])
+    if kwargs:
+        key += tuple([v.__class__ for v in kwargs.values()])
+    return key
+
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+
+class SingleFlight:
+    def __init__(self):
+        self.lock = Lock()
+        self.calls: dict[Hashable, Lock] = {}  # key -> held while computing its entry
+
+    def __len__(self) -> int:
+        return len(self.calls)
+
+    def __call__(self, key: K, find: Callable[[K], V | None], compute: Callable[[K], V]) -> V:
+        """Return find(key) or else compute(key), which should store its entry for find"""
+        with self.lock:
+            lock = self.calls.setdefault(key, Lock())
+        try:
+            with lock:
+                # Computed while waiting
+                value = find(key)
+                if value is None:
+                    value = compute(key)
+                return value
+        finally:
+            with self.lock:
+                if self.calls.get(key) is lock and not lock.locked():
+                    del self.calls[key]
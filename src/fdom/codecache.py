@@ -0,0 +1,99 @@
+import marshal
+import os
+import sys
+from functools import cache
+from hashlib import sha256
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from types import CodeType
+
+from fdom.astparser import KeyThunk
+from fdom.basecompiler import BaseCompiler
+from fdom.taglib import Chunk
+
+
+"""
+Persistent cache of compiled template code, shared across processes.
+
+Each entry is the marshalled code object generated by a compiler for one
+template, so a freshly started (or forked) process can load renderers without
+parsing the template or generating its code again.
+
+Entries live in a subdirectory named for the compiler version, which hashes
+the fdom sources together with the cache tag of the running interpreter (marshal
+is not portable across Python versions). Changing fdom therefore starts a new,
+empty subdirectory; prune removes the stale ones.
+
+NOTE marshal is not safe against maliciously constructed data, so the cache
+directory must only be writable by the application itself.
+"""
+
+
+@cache
+def source_version() -> str:
+    """Hash of the fdom sources, which determine the generated code"""
+    digest = sha256()
+    for path in sorted(Path(__file__).parent.glob('*.py')):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+@cache
+def compiler_version() -> str:
+    """Like source_version, but also specific to the marshal format in use"""
+    return f'{source_version()}-{sys.implementation.cache_tag}'
+
+
+class CodeCache:
+    def __init__(self, directory: str | os.PathLike, version: str | None = None):
+        self.root = Path(directory)
+        self.version = compiler_version() if version is None else version
+        self.directory = self.root / self.version
+
+    def key_text(self, compiler: type[BaseCompiler], keyed_args: tuple[Chunk | KeyThunk, ...]) -> str:
+        return repr((compiler.__module__, compiler.__qualname__, keyed_args))
+
+    def path(self, key_text: str) -> Path:
+        return self.directory / f'{sha256(key_text.encode()).hexdigest()}.marshal'
+
+    def load(self, compiler: type[BaseCompiler], keyed_args: tuple[Chunk | KeyThunk, ...]) -> CodeType | None:
+        key_text = self.key_text(compiler, keyed_args)
+        try:
+            data = self.path(key_text).read_bytes()
+            stored_key_text, code_obj = marshal.loads(data)
+        except (OSError, EOFError, ValueError, TypeError):
+            # Missing, or truncated by a crash; in either case recompile
+            return None
+        if stored_key_text != key_text or not isinstance(code_obj, CodeType):
+            return None
+        return code_obj
+
+    def store(self, compiler: type[BaseCompiler], keyed_args: tuple[Chunk | KeyThunk, ...], code_obj: CodeType) -> None:
+        key_text = self.key_text(compiler, keyed_args)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # Write then rename, so that concurrent processes never observe
+            # a partially written entry
+            with NamedTemporaryFile(dir=self.directory, suffix='.tmp', delete=False) as f:
+                f.write(marshal.dumps((key_text, code_obj)))
+            os.replace(f.name, self.path(key_text))
+        except OSError:
+            # The cache is an optimization only, so rendering continues
+            pass
+
+    def clear(self) -> None:
+        """Remove all entries for the current version"""
+        if self.directory.is_dir():
+            for path in self.directory.iterdir():
+                path.unlink(missing_ok=True)
+
+    def prune(self) -> None:
+        """Remove entries left behind by other versions of fdom or Python"""
+        if not self.root.is_dir():
+            return
+        for version_dir in self.root.iterdir():
+            if version_dir.is_dir() and version_dir.name != self.version:
+                for path in version_dir.iterdir():
+                    path.unlink(missing_ok=True)
+                version_dir.rmdir()
@@ -0,0 +1,86 @@
+from collections import OrderedDict
+from functools import partial, update_wrapper
+from threading import Lock
+from time import monotonic
+from typing import Any, Callable
+
+from fdom.caching import CacheInfo, typed_key
+
+
+"""
+Memoized components, whose rendered output is cached by their arguments.
+
+    @memoize(maxsize=512, ttl=60)
+    def Card(title, body):
+        return html'<div class="card"><h2>{title}</h2>{body}</div>'
+
+Opt in only for pure components, whose output depends on nothing but their
+arguments, which must also be hashable; calls with any unhashable argument
+are passed through to the component uncached. On a hit the component is not
+called at all, so the same HTML is returned for equal arguments of the same
+types, across pages and requests, until it is evicted as least recently used
+or expires.
+"""
+
+
+class MemoizedComponent:
+    def __init__(self, component: Callable, maxsize: int = 256, ttl: float | None = None):
+        self.component = component
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries: OrderedDict[tuple, tuple[float | None, Any]] = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        update_wrapper(self, component)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.component!r})'
+
+    def __call__(self, *args, **kwargs):
+        key = typed_key(args, kwargs)
+        now = monotonic() if self.ttl is not None else None
+        try:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None:
+                    expires, result = entry
+                    if expires is None or expires > now:
+                        self.hits += 1
+                        self.entries.move_to_end(key)
+                        return result
+                    del self.entries[key]
+                    self.expired += 1
+                self.misses += 1
+        except TypeError:
+            # unhashable arguments
+            return self.component(*args, **kwargs)
+
+        # Rendered outside the lock, since components nest
+        result = self.component(*args, **kwargs)
+        with self.lock:
+            self.entries[key] = (None if now is None else now + self.ttl, result)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return result
+
+    def cache_info(self) -> CacheInfo:
+        with self.lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self.entries), expired=self.expired)
+
+    def cache_clear(self) -> None:
+        """Remove all cached renders and reset the statistics"""
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.expired = 0
+
+
+def memoize(component: Callable | None = None, *, maxsize: int = 256, ttl: float | None = None):
+    """Decorator caching renders of a pure component, as @memoize or @memoize(maxsize=..., ttl=...)
+
+    ttl is in seconds; by default, renders are kept until evicted.
+    """
+    if component is None:
+        return partial(memoize, maxsize=maxsize, ttl=ttl)
+    return MemoizedComponent(component, maxsize, ttl)
@@ -1,20 +1,15 @@
-from functools import lru_cache
 from typing import Callable
 
-from fdom.astparser import make_key, parse_keyed_template_as_ast
 from fdom.fdomcompiler import FdomCompiler
-from fdom.taglib import Chunk, Thunk, convert_to_proposed_scheme
+from fdom.taglib import Chunk, Thunk
+from fdom.templatecache import get_template_cache
+from fdom.vdom import Rendered
 
 
-@lru_cache
 def compile_template(*keyed_args) -> Callable:
-    ast = parse_keyed_template_as_ast(*keyed_args)
-    print('Compiling...')
-    return FdomCompiler()(ast)
+    return get_template_cache().get(FdomCompiler, keyed_args)
 
 
-def html(*args: Chunk | Thunk) -> str:
-    args = convert_to_proposed_scheme(*args)
-    keyed_args = make_key(*args)
-    compiled_template = compile_template(*keyed_args)
+def html(*args: Chunk | Thunk) -> Rendered:
+    compiled_template, args = get_template_cache().lookup(FdomCompiler, args)
     return compiled_template(args)
@@ -1,215 +1,224 @@
-from abc import abstractmethod
-from collections.abc import Generator, Iterable
-from html import escape
-from typing import Any, Callable
-import re
-
-from fdom.astparser import E, Interpolation, Tag, is_static_element
+from fdom.astparser import E, Interpolation, Tag
 from fdom.basecompiler import BaseCompiler
-from fdom.taglib import Chunk, Conversion, Thunk
+from fdom.htmlcompiler import check_valid_attribute_name, check_valid_tagname
 
 
 """
-What do we want here?
+Compiles templates to functions building a virtual DOM from fdom.vdom, eg for
 
-<html attr=attr1>...</html>
+<ul class="todos">{items}<li>Done</li></ul>
 
-self.tag.html(attrs={...}, children=[])
-plus be able to support interpolations
+the generated code is
 
-<{MyComponent}>...</...>
+_static0 = Element('li', {}, ['Done'])
 
-just assumes MyComponent will resolve to a valid reference;
-this can also be arbitrary, with any desired initialization/setup
+def render(args):
+    _a0 = {'class': 'todos'}
+    _v0 = args[1].getvalue()
+    _r0 = get_children(_v0)
+    _e0 = Element('ul', _a0, [_r0, _static0])
+    return Rendered(render, [_e0], [_v0], [Children(_r0)])
 
-<h{level}>...</...>
-resolves to self.tag.h{level}
+Each interpolation is a slot, numbered in template order, whose value is kept
+in the Rendered along with its target, so that two renders of the template
+can be diffed slot by slot. Static subtrees are built once, as constants of
+the generated module, so are shared by all renders and never compared.
 
+An attribute named key sets the key of its element, used to match children
+when diffing, rather than being an attribute.
 
-Generated code:
-I don't see how we can avoid a standard functional evaluation order
-here, but the rendering of the DOM nodes itself can presumably do
-diffing/patching, etc
+For each element with interpolated attributes, a function building all its
+attributes from the values of the slots is also generated, as the target of
+those slots, so that patch can build them again when any of them changes.
 """
 
 
-class HTML(str):
-    """Marker class for HTML content"""
-    pass
-
-
-attribute_name_re = re.compile(r'^[a-zA-Z_][a-zA-Z0-9_\-\.]*$')
-tagname_re = re.compile(r'^(?!.*--)(?!-?[0-9])[\w-]+(-[\w-]+|[a-zA-Z])?$')
-
-
-class FdomRuntimeMixin:
-    def __init__(self, args: list[Chunk | Thunk]):
-        self.args = args
-        self.marker = HTML
-
-    def convert(self, obj: Any, conv: Conversion) -> str:
-        match conv:
-            case 'a':
-                return ascii(obj)
-            case 'r':
-                return repr(obj)
-            case 's' | None:
-                return str(obj)
-
-    def unpack_value(self, value, fspec) -> Iterable[HTML]:
-        match value:
-            case HTML():
-                yield value
-            case str():
-                yield HTML(escape(format(value, fspec)))
-            case Iterable():
-                for elem in value:
-                    yield from self.unpack_value(elem, fspec)
-            case _:
-                yield HTML(escape(format(value, fspec)))
-
-    def getvalue(self, index: int) -> Iterable[HTML]:
-        # FIXME handle conversions with conv
-        arg = self.args[index]
-        value = arg.getvalue()
-        fspec = '' if arg.formatspec is None else arg.formatspec
-        yield from self.unpack_value(value, fspec)
-
-    def check_valid_tagname(self, tagname: str):
-        if not tagname_re.match(tagname):
-            raise ValueError(f'Invalid tag name: {tagname!r}')
-
-    def check_valid_attribute_name(self, attribute_name: str):
-        if not attribute_name_re.match(attribute_name):
-            raise ValueError(f'Invalid attribute name: {attribute_name!r}')
-
-    def get_tagname(self, *builder: str) -> str:
-        tagname = ''.join(builder)
-        self.check_valid_tagname(tagname)
-        return HTML(f"<{tagname}")
-
-    def get_end_tagname(self, *builder: str) -> str:
-        tagname = ''.join(builder)
-        self.check_valid_tagname(tagname)
-        return HTML(f"</{tagname}>")
-
-    def get_key_value(self, k_builder: list[str], v: bool | dict | list[Any]) -> str:
-        k = ''.join(k_builder)
-        self.check_valid_attribute_name(k)
-        match k, v:
-            # Only show boolean keys if True
-            case _, True:
-                return HTML(str(k))
-            case _, False:
-                return None
-            # FIXME are there other HTML attributes that use this formatting?
-            # Also we may want to support this formatting with the
-            # formatspec, such as for custom elements
-            case 'style', dict() as d:
-                styling_list = []
-                for sub_k, sub_v in d.items():
-                    styling_list.append(f'{sub_k}: {sub_v}')
-                styling = escape('; '.join(styling_list), quote=True)
-                return HTML(f'{k}="{styling}"')
-            case _, list() as v_list:
-                quoted_v = escape(''.join(str(part) for part in v_list), quote=True)
-                return HTML(f'{k}="{quoted_v}"')
-            case _, _:
-                quoted_v = escape(str(v), quote=True)
-                return HTML(f'{k}="{quoted_v}"')
-
-    def get_attrs_dict(self, value: Any):
-        attrs = []
-        match value:
-            case dict() as d:
-                for k, v in d.items():
-                    setting = self.get_key_value([k], v)
-                    if setting is not None:
-                        attrs.append(setting)
-                return HTML(' '.join(attrs))
-            case _:
-                raise ValueError(f'Attributes must be a dict, not {type(value)!r}')
-
-
 class FdomCompiler(BaseCompiler):
 
+    runtime = ('Attribute', 'Attributes', 'Children', 'Element', 'Key', 'Rendered', 'TagName', 'get_children',
+               'set_attribute', 'set_attrs')
+
     def __init__(self, indent=2):
-        self.yield_block = []
-        self.preamble = '\ndef __call__(self):'
+        self.constants: list[str] = []
+        self.functions: list[str] = []  # lines of module level functions, eg building attributes
+        self.values: list[str] = []  # local holding the value of each slot
+        self.targets: list[str] = []  # expression for the target of each slot
+        self.elements = 0
+        self.preamble = '\ndef render(args):'
         super().__init__()
-        self.name = '__call__'
-
-    def __call__(self, tag: Tag) -> Callable:
-        code = super().__call__(tag)
-        return type('TemplateRenderer', (FdomRuntimeMixin,), {'__call__': code})
-
-    def add_interpolation(self, i: Interpolation) -> str:
-        local_var = f'_arg{i.index}'
-        formatspec = '' if i.formatspec is None else i.formatspec
-        if i.conv is None:
-            self.add_line(
-                f'{local_var} = format(self.args[{i.index}].getvalue(), {formatspec!r})')
+        self.name = 'render'
+
+    @property
+    def code(self) -> str:
+        header = ['from fdom.htmlcompiler import check_valid_tagname', f'from fdom.vdom import {", ".join(self.runtime)}']
+        for i, constant in enumerate(self.constants):
+            header.append(f'_static{i} = {constant}')
+        return '\n'.join(header + self.functions + self.lines)
+
+    def add_constant(self, expr: str) -> str:
+        self.constants.append(expr)
+        return f'_static{len(self.constants) - 1}'
+
+    def add_slot(self, expr: str, target: str) -> str:
+        name = f'_v{len(self.values)}'
+        self.add_line(1, f'{name} = {expr}')
+        self.values.append(name)
+        self.targets.append(target)
+        return name
+
+    def get_interpolation(self, i: Interpolation) -> str:
+        """Expression for the str of an interpolation, as in an f-string"""
+        value = f'args[{i.index}].getvalue()'
+        match i.conv:
+            case 'a':
+                value = f'ascii({value})'
+            case 'r':
+                value = f'repr({value})'
+            case 's':
+                value = f'str({value})'
+        if i.formatspec:
+            return f'format({value}, {i.formatspec!r})'
+        elif i.conv is None:
+            return f'str({value})'
         else:
-            self.add_line(
-                f'{local_var} = format(self.convert(self.args[{i.index}].getvalue(), {i.conv!r}), {formatspec!r})')
-        return local_var
+            return value
 
-    def add_child_interpolation(self, level: int, i: Interpolation) -> str:
-        # need to supply formatspec, conv
-        # refactor formulations like this:
-        # formatspec = '' if i.formatspec is None else i.formatspec
-        self.add_line(level, 'self.getvalue({i.index}),')
+    def get_raw_interpolation(self, i: Interpolation) -> str:
+        """Expression for the value of an interpolation, unless converted or formatted"""
+        if i.conv is None and not i.formatspec:
+            return f'args[{i.index}].getvalue()'
+        return self.get_interpolation(i)
 
-    def get_name_builder(self, elements: E):
+    def get_name_builder(self, elements: E) -> str:
         name_args = []
         for item in elements:
             match item:
                 case str() as s:
                     name_args.append(repr(s))
                 case Interpolation() as i:
-                    name_args.append(self.add_interpolation(i))
-        return ', '.join(name_args)
+                    name_args.append(self.get_interpolation(i))
+        return f"''.join([{', '.join(name_args)}])"
+
+    def get_attr_value(self, v: E) -> str:
+        match v:
+            case [Interpolation() as i]:
+                # The value itself, so that bools and style dicts work
+                return self.get_raw_interpolation(i)
+            case _:
+                return self.get_name_builder(v)
+
+    def render_static(self, tag: Tag) -> str:
+        """Expression building a subtree without interpolations"""
+        children = ', '.join(
+            self.render_static(child) if child.__class__ is Tag else repr(child)
+            for child in tag.children)
+        check_valid_tagname(tag.tagname[0])
+        attrs = {}
+        key = ''
+        for k, v in tag.attrs:
+            check_valid_attribute_name(k[0])
+            value = True if v is None else v[0]
+            if k[0] == 'key':
+                key = f', key={value!r}'
+            else:
+                attrs[k[0]] = value
+        return f'Element({tag.tagname[0]!r}, {attrs!r}, [{children}]{key})'
+
+    def get_set_lines(self, attrs: str, settings: list[tuple[str | None, str | int]], value: str) -> list[str]:
+        """Lines setting attributes in order, with the value of each slot as formatted by value"""
+        lines = []
+        for name, setting in settings:
+            match name, setting:
+                case None, int() as slot:
+                    lines.append(f'set_attrs({attrs}, {value.format(slot)})')
+                case _, int() as slot:
+                    lines.append(f'set_attribute({attrs}, {name!r}, {value.format(slot)})')
+                case _, _:
+                    lines.append(f'{attrs}[{name!r}] = {setting}')
+        return lines
 
     def compile(self, tag: Tag, level=1):
-        tagname = None
-
-        # process the starting tagname itself
-        match tag:
-            case Tag(tagname=[str() as tagname]):
-                # no interpolations, so can special case
-                self.add_line(level + 1, f'self.tags.{tagname}(')
-            case Tag(tagname=[Interpolation() as i]):
-                self.add_line(level + 1, f'self.args[{i.index}].getvalue()(')
-            case Tag():
-                pass  # FIXME ignore for now, but support <h{level}> etc tags
-
-        self.add_line(level + 1, 'attrs={')
+        if tag.tagname is None:
+            # the root of a template with multiple top level nodes
+            nodes = [self.compile_node(child) for child in tag.children]
+        else:
+            nodes = [self.compile_node(tag)]
+        self.add_line(1, (
+            f'return Rendered(render, [{", ".join(nodes)}], '
+            f'[{", ".join(self.values)}], [{", ".join(self.targets)}])'))
+
+    def compile_node(self, node: str | Interpolation | Tag) -> str:
+        """Add any lines building node, and return an expression for it"""
+        match node:
+            case str():
+                return repr(node)
+            case Interpolation() as i:
+                region = f'_r{len(self.values)}'
+                value = self.add_slot(self.get_raw_interpolation(i), f'Children({region})')
+                self.add_line(1, f'{region} = get_children({value})')
+                return region
+            case Tag() as t if t.static:
+                return self.add_constant(self.render_static(t))
+            case Tag() as t:
+                return self.compile_element(t)
+
+    def compile_element(self, tag: Tag) -> str:
+        element = f'_e{self.elements}'
+        self.elements += 1
+
+        if tag.static_tagname:
+            check_valid_tagname(tag.tagname[0])
+            tagname = repr(tag.tagname[0])
+        else:
+            tagname = self.add_slot(self.get_name_builder(tag.tagname), f'TagName({element})')
+            self.add_line(1, f'check_valid_tagname({tagname})')
+
+        # Static attributes up to the first interpolation are a dict literal,
+        # any others are set in order, as are the values of slots
+        attrs = f'_a{self.elements - 1}'
+        build_attrs = f'_build_attrs{self.elements - 1}'
+        static_attrs = {}
+        settings = []  # (name, static value) or (name, slot), with no name for a dict
+        key = ''
         for k, v in tag.attrs:
-            match k:
-                case [str()]:
-                    self.add_line(level + 2, f'{k[0]!r}: {v[0]!r},')
-                case [Interpolation() as i] if v is None:
-                    name_arg = self.add_interpolation(i)
-                    self.add_line(level + 2, f'**self.get_attrs_dict({name_arg}),')
+            match k, v:
+                case ['key'], [str() as s]:
+                    key = f', key={s!r}'
+                case ['key'], _:
+                    key = f', key={self.add_slot(self.get_attr_value(v), f"Key({element})")}'
+                case [str() as name], None | [str()]:
+                    check_valid_attribute_name(name)
+                    value = True if v is None else v[0]
+                    if settings:
+                        settings.append((name, repr(value)))
+                    else:
+                        static_attrs[name] = value
+                case [str() as name], _:
+                    check_valid_attribute_name(name)
+                    settings.append((name, len(self.values)))
+                    self.add_slot(self.get_attr_value(v), f'Attribute({element}, {name!r}, {build_attrs})')
+                case [Interpolation() as i], None:
+                    settings.append((None, len(self.values)))
+                    self.add_slot(self.get_raw_interpolation(i), f'Attributes({element}, {build_attrs})')
+                case _, None:
+                    raise ValueError('Cannot resolve multiple interpolations into a dict/bool interpolation')
                 case _:
-                    match v:
-                        case None:
-                            raise ValueError('Cannot resolve multiple interpolations into a dict/bool interpolation')
-                        case _:
-                            self.add_line(f'yield self.get_key_value([{self.get_name_builder(k)}], [{self.get_name_builder(v)}])')
-        self.add_line(level + 1, '}, ')
-
-        # process children
-        self.add_line(level + 1, 'children=[')
-        for child in tag.children:
-            match child:
-                case str():
-                    self.add_line(level + 2, f'{child!r},')
-                case Interpolation() as i:
-                    self.add_child_interpolation(level + 2, i)
-                case Tag() as t:
-                    self.compile(t, level + 2)
-        self.add_line(level + 1, ']')
-
-        # end the tag
-        self.add_line(level, ')')
+                    raise ValueError('Interpolated attribute names are not supported, use a dict interpolation')
+        self.add_line(1, f'{attrs} = {static_attrs!r}')
+        for line in self.get_set_lines(attrs, settings, '_v{}'):
+            self.add_line(1, line)
+        if settings:
+            # Builds the attributes again from the values of the slots, when
+            # any of them is patched, so that static attributes and other
+            # slots overridden by a dict are restored
+            self.functions.extend([
+                '',
+                f'def {build_attrs}(values):',
+                f'    attrs = {static_attrs!r}',
+                *(f'    {line}' for line in self.get_set_lines('attrs', settings, 'values[{}]')),
+                '    return attrs',
+            ])
+
+        children = [self.compile_node(child) for child in tag.children]
+        self.add_line(1, f'{element} = Element({tagname}, {attrs}, [{", ".join(children)}]{key})')
+        return element
@@ -0,0 +1,193 @@
+import os
+from abc import abstractmethod
+from collections import OrderedDict
+from collections.abc import Hashable
+from hashlib import sha256
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from threading import Lock
+from time import monotonic, time
+from typing import Any, Callable
+
+from fdom.caching import CacheInfo, SingleFlight, typed_key
+from fdom.htmlcompiler import HTML
+from fdom.templatehandle import Template
+
+
+"""
+Cache of rendered fragments, for sidebars, footers, menus and the like that
+change rarely.
+
+    menu = template'<nav>{[MenuItem(item) for item in items]}</nav>'
+    fragments = FragmentCache(FileBackend('/var/cache/myapp/fragments'), ttl=300)
+    fragments.render(menu, items, key=f'menu-{user.role}')
+
+Entries are keyed on the keyed args of the template, plus the given key or
+else the values, with their types. In memory, these are compared as they are,
+so the values must be hashable, or else a key given. Files are shared across processes, so are
+named by the repr of the keyed args and a key, which must be given as a str.
+
+Concurrent renders of the same missing fragment are rendered only once: the
+first thread renders, while the others wait for its result.
+"""
+
+
+class FragmentBackend:
+    """Storage of rendered fragments by key, eg in memory or in files"""
+
+    def make_key(self, keyed_args: tuple, key: Any) -> Hashable:
+        """Key of the fragment of a template for a key, or its values"""
+        fragment_key = (keyed_args, key)
+        try:
+            hash(fragment_key)
+        except TypeError:
+            raise TypeError(f'Cannot key a fragment on unhashable {key!r}, give a key instead')
+        return fragment_key
+
+    @abstractmethod
+    def get(self, key: Hashable) -> str | None:
+        ...
+
+    @abstractmethod
+    def set(self, key: Hashable, value: str, ttl: float | None) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+
+class MemoryBackend(FragmentBackend):
+    """Least recently used fragments, bounded in number and total length"""
+
+    def __init__(self, maxsize: int = 1024, max_chars: int = 16 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.max_chars = max_chars
+        self.entries: OrderedDict[Hashable, tuple[float | None, str]] = OrderedDict()
+        self.chars = 0
+        self.lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Hashable) -> str | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires <= monotonic():
+                del self.entries[key]
+                self.chars -= len(value)
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: str, ttl: float | None) -> None:
+        if len(value) > self.max_chars:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.chars -= len(old[1])
+            self.entries[key] = (None if ttl is None else monotonic() + ttl, value)
+            self.chars += len(value)
+            while len(self.entries) > self.maxsize or self.chars > self.max_chars:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.chars -= len(evicted)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.chars = 0
+
+
+class FileBackend(FragmentBackend):
+    """Fragments as files in a directory, shared across processes"""
+
+    def __init__(self, directory: str | os.PathLike):
+        self.directory = Path(directory)
+
+    def make_key(self, keyed_args: tuple, key: Any) -> str:
+        # Values, or other keys, may have a repr that differs between
+        # processes, eg with the id of an object
+        if key.__class__ is not str:
+            raise TypeError(f'Fragments in files need a str key, not {key!r}')
+        return repr((keyed_args, key))
+
+    def path(self, key: str) -> Path:
+        return self.directory / f'{sha256(key.encode()).hexdigest()}.html'
+
+    def get(self, key: str) -> str | None:
+        try:
+            expires, stored_key, value = self.path(key).read_text(encoding='utf-8').split('\n', 2)
+            expired = expires and float(expires) <= time()
+        except (OSError, ValueError):
+            return None
+        if stored_key != key or expired:
+            return None
+        return value
+
+    def set(self, key: str, value: str, ttl: float | None) -> None:
+        expires = '' if ttl is None else repr(time() + ttl)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # Renamed into place, so that a page rendering in another
+            # process reads either the whole fragment, or its old one
+            with NamedTemporaryFile('w', encoding='utf-8', dir=self.directory, suffix='.tmp', delete=False) as f:
+                f.write(f'{expires}\n{key}\n{value}')
+            os.replace(f.name, self.path(key))
+        except OSError:
+            # Eg a full disk; the fragment is rendered again when next used
+            pass
+
+    def clear(self) -> None:
+        if self.directory.is_dir():
+            for path in self.directory.glob('*.html'):
+                path.unlink(missing_ok=True)
+
+
+class FragmentCache:
+    def __init__(self, backend: FragmentBackend | None = None, ttl: float | None = None):
+        self.backend = MemoryBackend() if backend is None else backend
+        self.ttl = ttl
+        self.lock = Lock()  # guards the statistics
+        self.rendering = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    def cache_info(self) -> CacheInfo:
+        with self.lock:
+            return CacheInfo(self.hits, self.misses)
+
+    def clear(self) -> None:
+        """Remove all fragments and reset the statistics"""
+        self.backend.clear()
+        with self.lock:
+            self.hits = self.misses = 0
+
+    def render(self, template: Template, *values: Any, key: Any = None) -> HTML:
+        """Render values with a template handle, or return the cached fragment for key or the values"""
+        return self.get_or_render(
+            self.backend.make_key(template.keyed_args, typed_key(values) if key is None else key),
+            lambda: template.render(*values))
+
+    def get_or_render(self, key: Hashable, render: Callable[[], str]) -> HTML:
+        value = self.find(key)
+        if value is None:
+            value = self.rendering(key, self.find, lambda key: self.add(key, render))
+        return HTML(value)
+
+    def find(self, key: Hashable) -> str | None:
+        value = self.backend.get(key)
+        if value is not None:
+            with self.lock:
+                self.hits += 1
+        return value
+
+    def add(self, key: Hashable, render: Callable[[], str]) -> str:
+        with self.lock:
+            self.misses += 1
+        value = render()
+        self.backend.set(key, value, self.ttl)
+        return value
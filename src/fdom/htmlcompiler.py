@@ -1,173 +1,584 @@
 from abc import abstractmethod
-from collections.abc import Generator, Iterable
+from contextlib import contextmanager
+from functools import lru_cache, partial
+from collections.abc import AsyncIterable, AsyncIterator, Generator, Iterable, Iterator
 from html import escape
+from inspect import isawaitable
 from typing import Any, Callable
 import re
+from textwrap import dedent
 
 from fdom.astparser import E, Interpolation, Tag, is_static_element
 from fdom.basecompiler import BaseCompiler
 from fdom.taglib import Chunk, Conversion, Thunk
 
 
+class HTML(str):
+    """Marker class for HTML content"""
+    pass
+
+
+class HTMLBytes(bytes):
+    """Marker class for HTML content encoded as UTF-8, as from html_bytes"""
+    pass
+
+
+# Yielded by a renderer where any output so far should be sent on, eg before
+# waiting on a slow data source. Being empty, it is otherwise harmless to join.
+FLUSH = HTML()
+
+DEFAULT_CHUNK_SIZE = 16 * 1024
+
+
+def coalesce(parts: Iterable[str], size: int = DEFAULT_CHUNK_SIZE, encoding: str | None = None) -> Iterator[str | bytes]:
+    """Join parts into chunks of at least size, except at FLUSH and the end"""
+    join = ''.join if encoding is None else b''.join
+    buffer = []
+    buffered = 0
+    for part in parts:
+        if part is FLUSH:
+            if buffer:
+                yield join(buffer)
+                buffer = []
+                buffered = 0
+            continue
+        if encoding is not None:
+            part = part.encode(encoding)
+        buffer.append(part)
+        buffered += len(part)
+        if buffered >= size:
+            yield join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield join(buffer)
+
+
 class HTMLIterator:
+    """Lazily rendered fragment of HTML, as returned by html_iter
+
+    Rendering starts only when the fragment is iterated, so interpolating a
+    fragment into another template streams its output through the outer
+    renderer, without first joining it into a string.
+    """
+
+    __slots__ = ()
+
     @abstractmethod
     def __iter__(self):
         ...
 
+    def chunks(self, size: int = DEFAULT_CHUNK_SIZE, encoding: str | None = None) -> Iterator[str | bytes]:
+        """Iterate over the output coalesced into chunks of about size
 
-class HTML(str):
-    """Marker class for HTML content"""
-    pass
+        With an encoding, chunks are bytes and size counts bytes, eg for a
+        WSGI response. A chunk ends early at FLUSH, eg interpolated after
+        </head> so that the browser can start loading assets.
+        """
+        return coalesce(self, size, encoding)
+
+
+class AsyncHTMLIterator:
+    """Lazily rendered fragment of HTML, as returned by html_aiter"""
+
+    __slots__ = ()
+
+    @abstractmethod
+    def __aiter__(self):
+        ...
 
 
+# The str of these types can never contain markup
+_unescaped_types = frozenset({int, float, bool})
+
+_html_type = {HTML}
+_str_type = {str}
+_str_types = frozenset({str, HTML})
+
 attribute_name_re = re.compile(r'^[a-zA-Z_][a-zA-Z0-9_\-\.]*$')
 tagname_re = re.compile(r'^(?!.*--)(?!-?[0-9])[\w-]+(-[\w-]+|[a-zA-Z])?$')
 
+# References to args in generated code, eg args[3].getvalue()
+args_re = re.compile(r'\bargs\[(\d+)\]')
+
+
+# Dynamic names mostly repeat, such as h1...h6 or the keys of spread
+# attribute dicts, so memoize their validation
+
+@lru_cache(maxsize=4096)
+def is_valid_tagname(tagname: str) -> bool:
+    return tagname_re.match(tagname) is not None
+
+
+@lru_cache(maxsize=4096)
+def is_valid_attribute_name(attribute_name: str) -> bool:
+    return attribute_name_re.match(attribute_name) is not None
+
+
+def check_valid_tagname(tagname: str):
+    if not is_valid_tagname(tagname):
+        raise ValueError(f'Invalid tag name: {tagname!r}')
+
+
+def check_valid_attribute_name(attribute_name: str):
+    if not is_valid_attribute_name(attribute_name):
+        raise ValueError(f'Invalid attribute name: {attribute_name!r}')
+
+
+# Runtime of compiled templates. Generated renderers are plain functions of
+# their args, calling these directly, so a render allocates no renderer
+# object, and looks up nothing on one.
+
+def convert(obj: Any, conv: Conversion) -> str:
+    match conv:
+        case 'a':
+            return ascii(obj)
+        case 'r':
+            return repr(obj)
+        case 's' | None:
+            return str(obj)
+
+
+def unpack_value(value, fspec) -> Iterable[HTML]:
+    cls = value.__class__
+    if cls is str:
+        yield HTML(escape(format(value, fspec) if fspec else value))
+        return
+    elif cls is HTML:
+        yield value
+        return
+
+    # Nested iterables are flattened with a stack of iterators, rather
+    # than recursing with a generator for each element
+    stack = [iter((value,))]
+    while stack:
+        for value in stack[-1]:
+            # Fast paths on the exact type of common values
+            cls = value.__class__
+            if cls is HTML:
+                yield value
+            elif cls is str:
+                yield HTML(escape(format(value, fspec) if fspec else value))
+            elif cls in _unescaped_types:
+                yield HTML(escape(format(value, fspec))) if fspec else HTML(value)
+            elif (cls is list or cls is tuple) and not fspec and (kinds := set(map(type, value))) <= _str_types:
+                # A flat list of strings is escaped in one go
+                if kinds == _html_type:
+                    yield HTML(''.join(value))
+                elif kinds == _str_type:
+                    yield HTML(escape(''.join(value)))
+                else:
+                    yield HTML(''.join([v if v.__class__ is HTML else escape(v) for v in value]))
+            else:
+                match value:
+                    case AsyncHTMLIterator():
+                        raise TypeError('Cannot render an async fragment here, use html_aiter for the enclosing template')
+                    case HTMLIterator():
+                        yield from value
+                    case str():
+                        yield HTML(escape(format(value, fspec)))
+                    case bytes() | bytearray():
+                        raise TypeError('Cannot render bytes here, use html_bytes for the enclosing template')
+                    case Iterable():
+                        stack.append(iter(value))
+                        break
+                    case _:
+                        yield HTML(escape(format(value, fspec)))
+        else:
+            stack.pop()
+
+
+def join_value(value, fspec) -> str:
+    """The output of unpack_value as one str, eg for EagerHTMLCompiler"""
+    # Nested fragments, as a list of HTML, and numbers are the common cases,
+    # joined or formatted without a generator or copying their output again
+    cls = value.__class__
+    if cls is list or cls is tuple:
+        if not fspec and set(map(type, value)) == _html_type:
+            return ''.join(value)
+    elif cls in _unescaped_types:
+        return escape(format(value, fspec)) if fspec else str(value)
+    return ''.join(unpack_value(value, fspec))
+
+
+def unpack_bytes(value, fspec) -> Iterable[bytes]:
+    """Like unpack_value, but encoded, with HTMLBytes passed through as markup"""
+    match value:
+        case HTMLBytes():
+            yield value
+        case bytes() | bytearray():
+            # Eg read from a file or a request, so not known to be markup
+            raise TypeError('Cannot render bytes, only HTMLBytes, eg from html_bytes; decode them to render as text')
+        case str() | HTMLIterator():
+            yield ''.join(unpack_value(value, fspec)).encode()
+        case list() | tuple() if all(v.__class__ in _str_types for v in value):
+            # Escaped and encoded in one go
+            yield ''.join(unpack_value(value, fspec)).encode()
+        case Iterable():
+            for v in value:
+                yield from unpack_bytes(v, fspec)
+        case _:
+            yield ''.join(unpack_value(value, fspec)).encode()
+
+
+def get_tagname(*builder: str) -> str:
+    tagname = ''.join(builder)
+    check_valid_tagname(tagname)
+    return HTML(f"<{tagname}")
+
+
+def get_end_tagname(*builder: str) -> str:
+    tagname = ''.join(builder)
+    check_valid_tagname(tagname)
+    return HTML(f"</{tagname}>")
+
+
+def get_key_value(k_builder: list[str], v: Any) -> str:
+    k = ''.join(k_builder)
+    check_valid_attribute_name(k)
+    return format_key_value(k, v)
+
+
+def format_key_value(k: str, v: Any) -> str:
+    match k, v:
+        # Only show boolean keys if True
+        case _, True:
+            return HTML(str(k))
+        case _, False:
+            return None
+        # FIXME are there other HTML attributes that use this formatting?
+        # Also we may want to support this formatting with the
+        # formatspec, such as for custom elements
+        case 'style', dict() as d:
+            return HTML(f'{k}="{format_style(d)}"')
+        case _, _:
+            quoted_v = escape(str(v), quote=True)
+            return HTML(f'{k}="{quoted_v}"')
+
+
+def get_attribute(k_builder: list[str], v: Any) -> str:
+    """An attribute with its leading space, or nothing if it is omitted"""
+    setting = get_key_value(k_builder, v)
+    return HTML() if setting is None else HTML(f' {setting}')
+
+
+def get_static_attribute(k: str, v: Any) -> str:
+    """Like get_attribute, for a name that was validated when compiled"""
+    setting = format_key_value(k, v)
+    return HTML() if setting is None else HTML(f' {setting}')
+
+
+def get_attrs(value: Any) -> str:
+    """Spread attributes with a leading space, or nothing if there are none"""
+    match value:
+        case dict() as d:
+            write_attributes = get_attribute_writer(tuple(d))
+            return write_attributes(d.values(), get_static_attribute)
+        case _:
+            raise ValueError(f'Attributes must be a dict, not {type(value)!r}')
+
+
+async def resolve(value: Any) -> Any:
+    if isawaitable(value):
+        value = await value
+    return value
+
+
+async def aunpack_value(value, fspec) -> AsyncIterator[HTML]:
+    match value:
+        case HTML():
+            yield value
+        case AsyncHTMLIterator():
+            async for part in value:
+                yield part
+        case HTMLIterator():
+            for part in value:
+                yield part
+        case str():
+            yield HTML(escape(format(value, fspec)))
+        case bytes() | bytearray():
+            raise TypeError('Cannot render bytes here, use html_bytes for the enclosing template')
+        case AsyncIterable():
+            # Send any output so far, rather than holding it back while
+            # waiting on the data source
+            yield FLUSH
+            async for elem in value:
+                async for part in aunpack_value(elem, fspec):
+                    yield part
+        case Iterable():
+            for elem in value:
+                async for part in aunpack_value(elem, fspec):
+                    yield part
+        case _ if isawaitable(value):
+            yield FLUSH
+            async for part in aunpack_value(await value, fspec):
+                yield part
+        case _:
+            yield HTML(escape(format(value, fspec)))
+
+
+class Fragment(HTMLIterator):
+    """A compiled template bound to its args, rendered when iterated"""
+
+    __slots__ = ('render', 'args')
+
+    def __init__(self, render: Callable[[list], Iterator[HTML]], args: list[Chunk | Thunk]):
+        self.render = render
+        self.args = args
+
+    def __iter__(self) -> Iterator[HTML]:
+        return self.render(self.args)
+
+
+class AsyncFragment(AsyncHTMLIterator):
+    """Like Fragment, for an async renderer"""
+
+    __slots__ = ('render', 'args')
+
+    def __init__(self, render: Callable[[list], AsyncIterator[HTML]], args: list[Chunk | Thunk]):
+        self.render = render
+        self.args = args
+
+    def __aiter__(self) -> AsyncIterator[HTML]:
+        return self.render(self.args)
+
 
 class HTMLRuntimeMixin(HTMLIterator):
+    # Base for renderers written by hand, with the runtime above as methods
+
     def __init__(self, args: list[Chunk | Thunk]):
         self.args = args
         self.marker = HTML
 
     def convert(self, obj: Any, conv: Conversion) -> str:
-        match conv:
-            case 'a':
-                return ascii(obj)
-            case 'r':
-                return repr(obj)
-            case 's' | None:
-                return str(obj)
+        return convert(obj, conv)
 
     def unpack_value(self, value, fspec) -> Iterable[HTML]:
-        match value:
-            case HTML():
-                yield value
-            case str():
-                yield HTML(escape(format(value, fspec)))
-            case Iterable():
-                for elem in value:
-                    yield from self.unpack_value(elem, fspec)
-            case _:
-                yield HTML(escape(format(value, fspec)))
+        return unpack_value(value, fspec)
 
     def getvalue(self, index: int) -> Iterable[HTML]:
-        # FIXME handle conversions with conv
         arg = self.args[index]
         value = arg.getvalue()
+        if arg.conv is not None:
+            value = self.convert(value, arg.conv)
         fspec = '' if arg.formatspec is None else arg.formatspec
         yield from self.unpack_value(value, fspec)
 
     def check_valid_tagname(self, tagname: str):
-        if not tagname_re.match(tagname):
-            raise ValueError(f'Invalid tag name: {tagname!r}')
+        check_valid_tagname(tagname)
 
     def check_valid_attribute_name(self, attribute_name: str):
-        if not attribute_name_re.match(attribute_name):
-            raise ValueError(f'Invalid attribute name: {attribute_name!r}')
+        check_valid_attribute_name(attribute_name)
 
     def get_tagname(self, *builder: str) -> str:
-        tagname = ''.join(builder)
-        self.check_valid_tagname(tagname)
-        return HTML(f"<{tagname}")
+        return get_tagname(*builder)
 
     def get_end_tagname(self, *builder: str) -> str:
-        tagname = ''.join(builder)
-        self.check_valid_tagname(tagname)
-        return HTML(f"</{tagname}>")
-
-    def get_key_value(self, k_builder: list[str], v: bool | dict | list[Any]) -> str:
-        k = ''.join(k_builder)
-        self.check_valid_attribute_name(k)
-        match k, v:
-            # Only show boolean keys if True
-            case _, True:
-                return HTML(str(k))
-            case _, False:
-                return None
-            # FIXME are there other HTML attributes that use this formatting?
-            # Also we may want to support this formatting with the
-            # formatspec, such as for custom elements
-            case 'style', dict() as d:
-                styling_list = []
-                for sub_k, sub_v in d.items():
-                    styling_list.append(f'{sub_k}: {sub_v}')
-                styling = escape('; '.join(styling_list), quote=True)
-                return HTML(f'{k}="{styling}"')
-            case _, list() as v_list:
-                quoted_v = escape(''.join(str(part) for part in v_list), quote=True)
-                return HTML(f'{k}="{quoted_v}"')
-            case _, _:
-                quoted_v = escape(str(v), quote=True)
-                return HTML(f'{k}="{quoted_v}"')
+        return get_end_tagname(*builder)
+
+    def get_key_value(self, k_builder: list[str], v: Any) -> str:
+        return get_key_value(k_builder, v)
+
+    def format_key_value(self, k: str, v: Any) -> str:
+        return format_key_value(k, v)
+
+    def get_attribute(self, k_builder: list[str], v: Any) -> str:
+        return get_attribute(k_builder, v)
 
+    def get_static_attribute(self, k: str, v: Any) -> str:
+        return get_static_attribute(k, v)
+
+    def get_attrs(self, value: Any) -> str:
+        return get_attrs(value)
 
     def get_attrs_dict(self, value: Any):
-        attrs = []
-        match value:
-            case dict() as d:
-                for k, v in d.items():
-                    setting = self.get_key_value([k], v)
-                    if setting is not None:
-                        attrs.append(setting)
-                return HTML(' '.join(attrs))
-            case _:
-                raise ValueError(f'Attributes must be a dict, not {type(value)!r}')
+        return HTML(self.get_attrs(value)[1:])
+
+
+@lru_cache(maxsize=1024)
+def format_style_items(items: tuple[tuple[str, Any, type], ...]) -> str:
+    return escape('; '.join([f'{k}: {v}' for k, v, _ in items]), quote=True)
+
+
+def format_style(d: dict) -> str:
+    """Escaped value of a style attribute, eg from {'color': 'red'}"""
+    # Components tend to use the same few styles over and over. Keyed on the
+    # class of each value too, since equal values may format differently,
+    # eg 1, 1.0 and True
+    items = tuple([(k, v, v.__class__) for k, v in d.items()])
+    try:
+        return format_style_items(items)
+    except TypeError:
+        # unhashable values
+        return format_style_items.__wrapped__(items)
+
+
+@lru_cache(maxsize=1024)
+def get_attribute_writer(keys: tuple[str, ...]) -> Callable[[Iterable[Any], Callable], HTML]:
+    """Compile a function writing spread attributes with these keys, in order
+
+    The function takes the values and a fallback to format any attribute, eg
+    get_static_attribute; str values (and dicts for style) are written inline.
+    As with get_attrs, each attribute has a leading space.
+    """
+    for k in keys:
+        check_valid_attribute_name(k)
+    names = [f'_v{i}' for i in range(len(keys))]
+    parts = []
+    for k, name in zip(keys, names):
+        start = repr(f' {k}="')
+        if k == 'style':
+            fast = f"{start} + format_style({name}) + '\"' if {name}.__class__ is dict"
+        else:
+            fast = f"{start} + escape({name}) + '\"' if {name}.__class__ is str"
+        parts.append(f'({fast} else format_attribute({k!r}, {name}))')
+    code = '\n'.join([
+        'def write_attributes(values, format_attribute):',
+        f'    [{", ".join(names)}] = values',
+        f"    return HTML(''.join([{', '.join(parts)}]))",
+    ])
+    namespace = {'HTML': HTML, 'escape': escape, 'format_style': format_style}
+    exec(compile(code, f'<attributes {keys!r}>', 'exec'), namespace)
+    return namespace['write_attributes']
 
 
 class HTMLCompiler(BaseCompiler):
     # Optimized for WSGI consumption, so returns a generator, in a
-    # code-generated __iter__ method.
+    # code-generated render function of the args. Bound to its args as a
+    # Fragment, to be rendered when iterated.
+
+    # Renderers are plain functions rather than methods of a class, so each
+    # render is just a call, with the runtime functions above and the static
+    # blocks as globals of the generated module.
+
+    # See EagerHTMLCompiler and AsyncHTMLCompiler below for variants that
+    # return a single block of text, or support ASGI.
 
-    # Given that functionality could also capture a lot of information
-    # on any interpolations, so as to simplify that, let's make it a
-    # subclass on a passed-in class, constructing with type.
+    # Static content is folded at compile time: fully static subtrees are
+    # rendered, with attribute values and text escaped, and coalesced with any
+    # adjacent static text into a block. Each block is bound once as an HTML
+    # constant in the generated module, then yielded as is.
 
-    # NOTE it should be straightforward to construct from this example
-    # such variants as one that supports ASGI or is eager and returns a
-    # single block of text.
+    # Each interpolation is specialized at compile time on its conv and
+    # formatspec, which are part of the template key. A conversion always
+    # results in a str, so is escaped inline; otherwise strs are escaped
+    # inline, with any other value unpacked at runtime.
 
     def __init__(self, indent=2):
         self.yield_block = []
+        self.constants: dict[str, str] = {}  # block -> name
+        self.indentation = '    '
         self.preamble = \
-            f"""
-def __iter__(self):"""
+            """
+def render(args):"""
         super().__init__()
-        self.name = '__iter__'
+        self.name = 'render'
 
-    def __call__(self, tag: Tag) -> Callable:
-        code = super().__call__(tag)
-        return type('TemplateRenderer', (HTMLRuntimeMixin,), {'__iter__': code})
+    runtime = ('HTML', 'get_attribute', 'get_attrs', 'get_end_tagname', 'get_static_attribute', 'get_tagname',
+               'unpack_value')
+
+    @property
+    def code(self) -> str:
+        header = ['from html import escape', f'from fdom.htmlcompiler import {", ".join(self.runtime)}']
+        for block, name in self.constants.items():
+            header.append(f'{name} = {self.get_constant_value(block)}')
+        return '\n'.join(header + self.lines)
+
+    def get_constant_value(self, block: str) -> str:
+        return f'HTML({block!r})'
+
+    def bind(self, function: Callable) -> Callable:
+        return partial(Fragment, function)
 
     def add_yield_string(self, s: str):
         # NOTE enables the coalescing of static lines of text together
         # in one yield
         self.yield_block.append(s)
 
-    def add_interpolation(self, i: Interpolation) -> str:
-        local_var = f'_arg{i.index}'
-        formatspec = '' if i.formatspec is None else i.formatspec
-        if i.conv is None:
-            self.add_line(
-                f'{local_var} = format(self.args[{i.index}].getvalue(), {formatspec!r})')
+    def add_constant(self, block: str) -> str:
+        name = self.constants.get(block)
+        if name is None:
+            name = self.constants[block] = f'_static{len(self.constants)}'
+        return name
+
+    def flush_yield_block(self):
+        if self.yield_block:
+            block = ''.join(self.yield_block)
+            self.yield_block = []
+            self.add_yield_constant(self.add_constant(block))
+
+    def add_yield_constant(self, name: str):
+        self.add_yield(name)
+
+    def add_yield(self, expr: str):
+        self.add_line(f'yield {expr}')
+
+    def add_yield_from(self, expr: str):
+        self.add_line(f'yield from {expr}')
+
+    def add_unpack_value(self, value: str, formatspec: str):
+        self.add_yield_from(f'unpack_value({value}, {formatspec!r})')
+
+    def get_value(self, i: Interpolation) -> str:
+        return f'args[{i.index}].getvalue()'
+
+    def get_interpolation(self, i: Interpolation) -> str:
+        """Expression for the str of an interpolation, as in an f-string"""
+        value = self.get_value(i)
+        match i.conv:
+            case 'a':
+                value = f'ascii({value})'
+            case 'r':
+                value = f'repr({value})'
+            case 's':
+                value = f'str({value})'
+        if i.formatspec:
+            return f'format({value}, {i.formatspec!r})'
+        elif i.conv is None:
+            return f'str({value})'
         else:
-            self.add_line(
-                f'{local_var} = format(self.convert(self.args[{i.index}].getvalue(), {i.conv!r}), {formatspec!r})')
-        return local_var
+            return value
+
+    def get_raw_interpolation(self, i: Interpolation) -> str:
+        """Expression for the value of an interpolation, unless converted or formatted"""
+        if i.conv is None and not i.formatspec:
+            return self.get_value(i)
+        return self.get_interpolation(i)
+
+    def get_escaped(self, expr: str) -> str:
+        return f'HTML(escape({expr}))'
+
+    def add_child_interpolation(self, i: Interpolation):
+        if i.conv is not None:
+            self.add_yield(self.get_escaped(self.get_interpolation(i)))
+            return
 
-    def add_child_interpolation(self, i: Interpolation) -> str:
         formatspec = '' if i.formatspec is None else i.formatspec
-        self.add_line(f'yield from self.getvalue({i.index})')
+        self.add_line(f'_value = args[{i.index}].getvalue()')
+        self.add_line('if _value.__class__ is str:')
+        with self.block():
+            if formatspec:
+                self.add_yield(self.get_escaped(f'format(_value, {formatspec!r})'))
+            else:
+                self.add_yield(self.get_escaped('_value'))
+        self.add_line('else:')
+        with self.block():
+            self.add_unpack_value('_value', formatspec)
 
     def add_line(self, line: str):
-        if self.yield_block:
-            block = ''.join(self.yield_block)
-            block.replace("'", r"\'")
-            if '\n' in block:
-                self.lines.append(f"    yield self.marker('''{block}''')")
-            else:
-                self.lines.append(f"    yield self.marker('{block}')")
-            self.yield_block = []
-        self.lines.append(f'    {line}')
+        self.flush_yield_block()
+        self.lines.append(f'{self.indentation}{line}')
+
+    @contextmanager
+    def block(self):
+        """Indent lines added in this context, eg as the body of an if"""
+        self.flush_yield_block()
+        self.indentation += '    '
+        try:
+            yield
+        finally:
+            self.flush_yield_block()
+            self.indentation = self.indentation[:-4]
 
     def get_name_builder(self, elements: E):
         name_args = []
@@ -176,64 +587,393 @@ def __iter__(self):"""
                 case str() as s:
                     name_args.append(repr(s))
                 case Interpolation() as i:
-                    name_args.append(self.add_interpolation(i))
+                    name_args.append(self.get_interpolation(i))
         return ', '.join(name_args)
 
+    def get_attr_value(self, v: E) -> str:
+        match v:
+            case [Interpolation() as i]:
+                # The value itself, so that bools and style dicts work
+                return self.get_raw_interpolation(i)
+            case _:
+                # Multiple parts are joined in the generated code, so the
+                # runtime only ever sees values of interpolations
+                return f"''.join([{self.get_name_builder(v)}])"
+
+    def add_attribute(self, name: str, v: E):
+        """Add an attribute with a static name and an interpolated value"""
+        self.add_yield(f'get_static_attribute({name!r}, {self.get_attr_value(v)})')
+
+    def render_static(self, tag: Tag) -> str:
+        """Render a subtree without interpolations"""
+        children = ''.join(
+            self.render_static(child) if child.__class__ is Tag else escape(child)
+            for child in tag.children)
+        if tag.tagname is None:
+            return children
+        tagname = tag.tagname[0]
+        check_valid_tagname(tagname)
+        for k, _ in tag.attrs:
+            check_valid_attribute_name(k[0])
+        attrs = ''.join(
+            f' {k[0]}' if v is None else f' {k[0]}="{escape(v[0], quote=True)}"'
+            for k, v in tag.attrs)
+        return f'<{tagname}{attrs}>{children}</{tagname}>'
+
     def compile(self, tag: Tag, level=1):
+        if tag.static:
+            self.add_yield_string(self.render_static(tag))
+        elif tag.tagname is None:
+            # the root of a template with multiple top level nodes
+            self.compile_children(tag, level)
+        else:
+            self.compile_element(tag, level)
+
+        # ensure all blocks are closed out
+        if level == 1:
+            self.flush_yield_block()
+
+    def compile_children(self, tag: Tag, level: int):
+        for child in tag.children:
+            match child:
+                case str():
+                    self.add_yield_string(escape(child))
+                case Interpolation() as i:
+                    self.add_child_interpolation(i)
+                case Tag() as t:
+                    self.compile(t, level + 1)
+
+    def compile_element(self, tag: Tag, level: int):
         tagname = None
 
         # process the starting tagname itself
-        match tag:
-            case Tag(tagname=[str() as tagname]):
-                # no interpolations, so can special case
-                self.add_yield_string(f'<{tagname}')
-            case Tag():
-                tagname_builder = self.get_name_builder(tag.tagname)
-                self.add_line(f'yield self.get_tagname({tagname_builder})')
+        if tag.static_tagname:
+            # no interpolations, so can special case, validated here once
+            tagname = tag.tagname[0]
+            check_valid_tagname(tagname)
+            self.add_yield_string(f'<{tagname}')
+        else:
+            tagname_builder = self.get_name_builder(tag.tagname)
+            self.add_yield(f'get_tagname({tagname_builder})')
 
         for k, v in tag.attrs:
             match k:
                 case [str()]:
+                    # a static name is validated here once, not on each render
+                    check_valid_attribute_name(k[0])
                     match v:
                         case [str()]:
-                            self.add_yield_string(f' {k[0]}="{v[0]}"')
+                            self.add_yield_string(f' {k[0]}="{escape(v[0], quote=True)}"')
                         case None:
                             # eg 'disabled'
                             self.add_yield_string(f' {k[0]}')
                         case _:
-                            self.add_yield_string(f' ')
-                            self.add_line(f'yield self.get_key_value({k[0]!r}, [{self.get_name_builder(v)}])')
+                            self.add_attribute(k[0], v)
                 case [Interpolation() as i] if v is None:
-                    self.add_yield_string(' ')
-                    name_arg = self.add_interpolation(i)
-                    self.add_line(f'yield self.get_attrs_dict({name_arg})')
+                    self.add_yield(f'get_attrs({self.get_raw_interpolation(i)})')
                 case _:
                     match v:
                         case None:
                             raise ValueError('Cannot resolve multiple interpolations into a dict/bool interpolation')
                         case _:
-                            self.add_yield_string(' ')
-                            self.add_line(f'yield self.get_key_value([{self.get_name_builder(k)}], [{self.get_name_builder(v)}])')
+                            self.add_yield(f'get_attribute([{self.get_name_builder(k)}], {self.get_attr_value(v)})')
 
         # close the start tag
         self.add_yield_string('>')
 
         # process children
-        for child in tag.children:
-            match child:
-                case str():
-                    self.add_yield_string(escape(child))
-                case Interpolation() as i:
-                    self.add_child_interpolation(i)
-                case Tag() as t:
-                    self.compile(t, level + 1)
+        self.compile_children(tag, level)
 
         # end the tag
         if tagname is None:
-            self.add_line(f'yield self.get_end_tagname({tagname_builder})')
+            self.add_yield(f'get_end_tagname({tagname_builder})')
         else:
             self.add_yield_string(f'</{tagname}>')
 
-        # ensure all blocks are closed out
+
+class ListHTMLCompiler(HTMLCompiler):
+    # Builds the output in a local list, in a code-generated render function,
+    # then returns the result, by default the list joined as one HTML string.
+    # The base of the backends below that need the output as parts.
+
+    result = "HTML(''.join(_out))"
+
+    def __init__(self, indent=2):
+        super().__init__(indent)
+        self.preamble = """
+def render(args):
+    _out = []
+    _append = _out.append
+    _extend = _out.extend"""
+        self.lines = dedent(self.preamble).split('\n')
+
+    def bind(self, function: Callable) -> Callable:
+        return function
+
+    def add_yield(self, expr: str):
+        self.add_line(f'_append({expr})')
+
+    def get_escaped(self, expr: str) -> str:
+        # Joined into HTML anyway
+        return f'escape({expr})'
+
+    def add_yield_from(self, expr: str):
+        self.add_line(f'_extend({expr})')
+
+    def compile(self, tag: Tag, level=1):
+        super().compile(tag, level)
+        if level == 1:
+            self.add_line(f'return {self.result}')
+
+
+class EagerHTMLCompiler(HTMLCompiler):
+    # Returns the output as one HTML string, built by a single f-string in a
+    # code-generated render function, so html is a single call of the
+    # function bound in the template cache. Each dynamic part is rendered to
+    # a local str in template order, with the static blocks inlined between
+    # them as the literal text of the f-string, eg for
+    #
+    #   <ul title={title}>{items}</ul>
+    #
+    # the generated code is
+    #
+    #   def render(args):
+    #       _value = args[1].getvalue()
+    #       if _value.__class__ is str:
+    #           _p0 = f' title="{escape(_value)}"'
+    #       else:
+    #           _p0 = get_static_attribute('title', _value)
+    #       _value = args[3].getvalue()
+    #       if _value.__class__ is str:
+    #           _p1 = escape(_value)
+    #       else:
+    #           _p1 = join_value(_value, '')
+    #       return HTML('<ul' f'{_p0}' '>' f'{_p1}' '</ul>')
+    #
+    # with strs escaped inline, as values of attributes too. Adjacent literals
+    # are compiled as one f-string, so the output is built by a single
+    # BUILD_STRING, rather than by appending to a list and joining it. Other
+    # values, such as a list of nested fragments, are joined by join_value,
+    # which copies their output no more often than the list would.
+    # HTMLCompiler remains the streaming backend.
+
+    runtime = HTMLCompiler.runtime + ('join_value',)
+
+    def __init__(self, indent=2):
+        super().__init__(indent)
+        self.pieces: list[str] = []  # static blocks and fields of the output, in order
+        self.parts = 0
+
+    def bind(self, function: Callable) -> Callable:
+        return function
+
+    def flush_yield_block(self):
+        if self.yield_block:
+            block = ''.join(self.yield_block)
+            self.yield_block = []
+            self.pieces.append(self.get_literal(block))
+
+    def get_literal(self, block: str) -> str:
+        return repr(block)
+
+    def add_part(self) -> str:
+        """Name of the local holding the next dynamic part of the output"""
+        name = f'_p{self.parts}'
+        self.parts += 1
+        self.pieces.append(self.get_field(name))
+        return name
+
+    def get_field(self, name: str) -> str:
+        return f"f'{{{name}}}'"
+
+    def get_part(self, expr: str) -> str:
+        """Expression for a dynamic part of the output, from one for its str"""
+        return expr
+
+    def add_yield(self, expr: str):
+        self.flush_yield_block()
+        self.add_line(f'{self.add_part()} = {self.get_part(expr)}')
+
+    def add_yield_from(self, expr: str):
+        self.flush_yield_block()
+        joined = f"''.join({expr})"
+        self.add_line(f'{self.add_part()} = {self.get_part(joined)}')
+
+    def get_escaped(self, expr: str) -> str:
+        # Built into HTML anyway
+        return f'escape({expr})'
+
+    def get_joined_value(self, value: str, formatspec: str) -> str:
+        return f'join_value({value}, {formatspec!r})'
+
+    def add_child_interpolation(self, i: Interpolation):
+        if i.conv is not None:
+            self.add_yield(self.get_escaped(self.get_interpolation(i)))
+            return
+
+        formatspec = '' if i.formatspec is None else i.formatspec
+        self.flush_yield_block()
+        name = self.add_part()
+        self.add_line(f'_value = args[{i.index}].getvalue()')
+        self.add_line('if _value.__class__ is str:')
+        with self.block():
+            escaped = self.get_escaped(f'format(_value, {formatspec!r})' if formatspec else '_value')
+            self.add_line(f'{name} = {self.get_part(escaped)}')
+        self.add_line('else:')
+        with self.block():
+            self.add_line(f'{name} = {self.get_joined_value("_value", formatspec)}')
+
+    def add_attribute(self, name: str, v: E):
+        match v:
+            case [Interpolation() as i] if i.conv is None and not i.formatspec:
+                # As for children, strs are written inline; the name was
+                # validated, so is safe in the f-string
+                self.flush_yield_block()
+                part = self.add_part()
+                self.add_line(f'_value = {self.get_value(i)}')
+                self.add_line('if _value.__class__ is str:')
+                with self.block():
+                    attribute = "f' " + name + '="{escape(_value)}"' + "'"
+                    self.add_line(f'{part} = {self.get_part(attribute)}')
+                self.add_line('else:')
+                with self.block():
+                    attribute = f'get_static_attribute({name!r}, _value)'
+                    self.add_line(f'{part} = {self.get_part(attribute)}')
+            case _:
+                super().add_attribute(name, v)
+
+    def get_result(self) -> str:
+        return f'HTML({" ".join(self.pieces)})'
+
+    def compile(self, tag: Tag, level=1):
+        super().compile(tag, level)
         if level == 1:
-            self.add_line('')
+            self.add_line(f'return {self.get_result()}')
+
+
+class BytesHTMLCompiler(EagerHTMLCompiler):
+    # Like EagerHTMLCompiler, but returns the output encoded as UTF-8, as
+    # HTMLBytes. Static blocks are bytes literals in the generated code, so
+    # only the dynamic parts are encoded at render time, each as it is
+    # rendered, then joined from a list display, eg
+    #
+    #   return HTMLBytes(b''.join([b'<ul', _p0, b'>', _p1, b'</ul>']))
+    #
+    # This saves encoding the static text of a page on each render, which
+    # also skips copying it into a str first.
+
+    runtime = HTMLCompiler.runtime + ('HTMLBytes', 'unpack_bytes')
+
+    def get_literal(self, block: str) -> str:
+        return repr(block.encode())
+
+    def get_field(self, name: str) -> str:
+        return name
+
+    def get_part(self, expr: str) -> str:
+        return f'{expr}.encode()'
+
+    def get_joined_value(self, value: str, formatspec: str) -> str:
+        return f"b''.join(unpack_bytes({value}, {formatspec!r}))"
+
+    def get_result(self) -> str:
+        return f"HTMLBytes(b''.join([{', '.join(self.pieces)}]))"
+
+
+class IncrementalHTMLCompiler(ListHTMLCompiler):
+    # Like ListHTMLCompiler, but renders into a list of parts, in a fixed
+    # layout of static blocks and dynamic segments, such as an attribute or
+    # a child interpolation. Each segment is guarded by the args it uses, so
+    # called again with the indices of changed args, only the segments using
+    # them are rendered again; see LiveRender in fdom.templatehandle.
+
+    result = 'parts'
+
+    def __init__(self, indent=2):
+        super().__init__(indent)
+        self.preamble = \
+            """
+def render(args, parts, changed):
+    if changed is None:
+        parts[:] = _layout
+    _out = []
+    _append = _out.append
+    _extend = _out.extend"""
+        self.lines = dedent(self.preamble).split('\n')
+        self.layout: list[str] = []  # names of static blocks, None for segments
+        self.in_segment = False
+
+    @property
+    def code(self) -> str:
+        return f'{super().code}\n_layout = ({", ".join(self.layout)},)'
+
+    def add_yield_constant(self, name: str):
+        self.layout.append(name)
+
+    @contextmanager
+    def segment(self):
+        """Render the output added in this context as one part"""
+        if self.in_segment:
+            yield
+            return
+        self.flush_yield_block()
+        start = len(self.lines)
+        self.in_segment = True
+        yield
+        self.in_segment = False
+
+        lines = self.lines[start:]
+        indices = sorted({int(index) for line in lines for index in args_re.findall(line)})
+        match indices:
+            case []:
+                condition = 'changed is None'
+            case [index]:
+                condition = f'changed is None or {index} in changed'
+            case _:
+                condition = f'changed is None or not changed.isdisjoint({tuple(indices)!r})'
+        self.lines[start:] = [
+            f'{self.indentation}if {condition}:',
+            *(f'    {line}' for line in lines),
+            f"{self.indentation}    parts[{len(self.layout)}] = ''.join(_out)",
+            f'{self.indentation}    _out.clear()',
+        ]
+        self.layout.append('None')
+
+    def add_yield(self, expr: str):
+        with self.segment():
+            super().add_yield(expr)
+
+    def add_yield_from(self, expr: str):
+        with self.segment():
+            super().add_yield_from(expr)
+
+    def add_child_interpolation(self, i: Interpolation):
+        with self.segment():
+            super().add_child_interpolation(i)
+
+
+class AsyncHTMLCompiler(HTMLCompiler):
+    # For ASGI, generates an async generator in an __aiter__ method. Values
+    # of interpolations may be awaitables, which are awaited, or async
+    # iterables, such as database cursors, which are iterated; see
+    # fdom.asgi.send_html to stream the result as a response.
+
+    def __init__(self, indent=2):
+        super().__init__(indent)
+        self.preamble = \
+            """
+async def render(args):"""
+        self.lines = dedent(self.preamble).split('\n')
+
+    runtime = HTMLCompiler.runtime + ('aunpack_value', 'resolve')
+
+    def bind(self, function: Callable) -> Callable:
+        return partial(AsyncFragment, function)
+
+    def add_unpack_value(self, value: str, formatspec: str):
+        # yield from is not allowed in an async generator
+        self.add_line(f'async for _part in aunpack_value({value}, {formatspec!r}):')
+        self.add_line('    yield _part')
+
+    def get_value(self, i: Interpolation) -> str:
+        return f'(await resolve(args[{i.index}].getvalue()))'
@@ -1,26 +1,50 @@
-from functools import lru_cache
-from typing import Callable, Iterable
+import os
+from importlib import import_module
+from typing import Callable
 
-from fdom.astparser import make_key, parse_keyed_template_as_ast
-from fdom.htmlcompiler import HTMLCompiler, HTML
-from fdom.taglib import Chunk, Thunk, convert_to_proposed_scheme
+from fdom.htmlcompiler import (
+    AsyncHTMLCompiler, AsyncHTMLIterator, BytesHTMLCompiler, EagerHTMLCompiler, FLUSH, HTMLCompiler, HTML, HTMLBytes,
+    HTMLIterator)
+from fdom.taglib import Chunk, Thunk
+from fdom.templatecache import get_template_cache, register_precompiled
+
+
+# Each compiler used by the tag functions below
+COMPILERS = (HTMLCompiler, EagerHTMLCompiler, BytesHTMLCompiler, AsyncHTMLCompiler)
 
 
-@lru_cache
 def compile_template(*keyed_args) -> Callable:
-    ast = parse_keyed_template_as_ast(*keyed_args)
-    return HTMLCompiler()(ast)
+    return get_template_cache().get(HTMLCompiler, keyed_args)
 
 
 def html(*args: Chunk | Thunk) -> str:
-    args = convert_to_proposed_scheme(*args)
-    keyed_args = make_key(*args)
-    compiled_template = compile_template(*keyed_args)
-    return HTML(''.join(compiled_template(args)))
+    compiled_template, args = get_template_cache().lookup(EagerHTMLCompiler, args)
+    return compiled_template(args)
+
+
+def html_bytes(*args: Chunk | Thunk) -> HTMLBytes:
+    """Like html, but encoded as UTF-8"""
+    compiled_template, args = get_template_cache().lookup(BytesHTMLCompiler, args)
+    return compiled_template(args)
+
+
+def html_iter(*args: Chunk | Thunk) -> HTMLIterator:
+    compiled_template, args = get_template_cache().lookup(HTMLCompiler, args)
+    return compiled_template(args)
+
+
+def html_aiter(*args: Chunk | Thunk) -> AsyncHTMLIterator:
+    compiled_template, args = get_template_cache().lookup(AsyncHTMLCompiler, args)
+    return compiled_template(args)
+
+
+def use_precompiled(module_name: str) -> bool:
+    """Render with templates compiled ahead of time by fdom.precompile"""
+    module = import_module(module_name)
+    return all(register_precompiled(compiler, module) for compiler in COMPILERS)
 
 
-def html_iter(*args: Chunk | Thunk) -> Iterable[str]:
-    args = convert_to_proposed_scheme(*args)
-    keyed_args = make_key(*args)
-    compiled_template = compile_template(*keyed_args)
-    return iter(compiled_template(args))
+# Comma separated module names, eg FDOM_PRECOMPILED=myapp._templates
+for module_name in os.environ.get('FDOM_PRECOMPILED', '').split(','):
+    if module_name.strip():
+        use_precompiled(module_name.strip())
@@ -0,0 +1,54 @@
+import logging
+from typing import Callable, NamedTuple
+
+from fdom.astparser import KeyThunk
+from fdom.taglib import Chunk
+
+
+"""
+Opt-in instrumentation of template compilation.
+
+Listeners are called with a CompileEvent each time a TemplateCache compiles a
+template, eg to feed metrics. With no listeners registered, no events are
+constructed.
+"""
+
+
+class CompileEvent(NamedTuple):
+    compiler: type
+    key: tuple[Chunk | KeyThunk, ...]
+    parse_time: float  # seconds
+    codegen_time: float  # seconds, including compiling to bytecode
+    exec_time: float  # seconds
+    code_size: int | None  # characters of source; None if loaded from a CodeCache
+
+
+CompileListener = Callable[[CompileEvent], None]
+
+compile_listeners: list[CompileListener] = []
+
+
+def add_compile_listener(listener: CompileListener) -> CompileListener:
+    compile_listeners.append(listener)
+    return listener
+
+
+def remove_compile_listener(listener: CompileListener) -> None:
+    compile_listeners.remove(listener)
+
+
+def log_compiles(logger: logging.Logger | None = None, level: int = logging.DEBUG) -> CompileListener:
+    """Log each compilation, by default to the fdom.compile logger"""
+    if logger is None:
+        logger = logging.getLogger('fdom.compile')
+
+    def log(event: CompileEvent) -> None:
+        logger.log(
+            level,
+            'Compiled %s template in %.3fms (parse %.3fms, codegen %.3fms, exec %.3fms, %s chars): %r',
+            event.compiler.__name__,
+            (event.parse_time + event.codegen_time + event.exec_time) * 1000,
+            event.parse_time * 1000, event.codegen_time * 1000, event.exec_time * 1000,
+            event.code_size, event.key)
+
+    return add_compile_listener(log)
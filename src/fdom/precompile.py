@@ -0,0 +1,228 @@
+import argparse
+import sys
+import tokenize
+from collections.abc import Iterable, Iterator
+from importlib.util import find_spec
+from io import StringIO
+from pathlib import Path
+from textwrap import indent
+
+from fdom.astparser import KeyThunk, parse_keyed_template_as_ast
+from fdom.codecache import source_version
+from fdom.htmltag import COMPILERS
+from fdom.taglib import Chunk
+from fdom.templatecache import compiler_name
+
+
+"""
+Ahead-of-time compilation of html'...' templates.
+
+Scans Python sources for tag string call sites, compiles each template with
+each of the compilers used by fdom.htmltag, and writes an importable module of
+the generated renderers:
+
+    python -m fdom.precompile myapp -o myapp/_templates.py
+
+Then set FDOM_PRECOMPILED=myapp._templates (or call fdom.htmltag.use_precompiled)
+so that fdom.htmltag uses these renderers before compiling at runtime. The module
+records the fdom version it was generated by, and is ignored (with a warning) by
+any other version.
+
+Scanning is purely lexical, so the sources are never imported. Templates with
+nested interpolations in a format spec cannot be keyed statically, and are left
+to runtime compilation.
+"""
+
+
+DEFAULT_TAGS = ('html', 'html_bytes', 'html_iter', 'html_aiter')
+
+
+def split_interpolation(field: str) -> KeyThunk:
+    """Return the conv and formatspec of an interpolation, eg from 'x!r:>10'"""
+    depth = 0
+    quote = None
+    i = 0
+    while i < len(field):
+        c = field[i]
+        if quote:
+            if c == '\\':
+                i += 1
+            elif field.startswith(quote, i):
+                i += len(quote) - 1
+                quote = None
+        elif c in '\'"':
+            quote = c * 3 if field.startswith(c * 3, i) else c
+            i += len(quote) - 1
+        elif c in '([{':
+            depth += 1
+        elif c in ')]}':
+            depth -= 1
+        elif depth == 0 and c == '!' and field[i + 1:i + 2] != '=':
+            conv, _, formatspec = field[i + 1:].partition(':')
+            return KeyThunk(conv, formatspec if ':' in field[i + 1:] else None)
+        elif depth == 0 and c == ':':
+            return KeyThunk(None, field[i + 1:])
+        i += 1
+    return KeyThunk(None, None)
+
+
+def make_static_key(template: str) -> tuple[Chunk | KeyThunk, ...] | None:
+    """Key a template from its source text, as make_key would at runtime"""
+    keyed_args = []
+    text = []
+    i = 0
+    while i < len(template):
+        c = template[i]
+        if c in '{}' and template[i + 1:i + 2] == c:
+            text.append(c)
+            i += 2
+            continue
+        if c != '{':
+            text.append(c)
+            i += 1
+            continue
+
+        # Find the matching close brace, skipping over any nested brackets
+        # and strings in the expression
+        depth = 1
+        quote = None
+        j = i + 1
+        while depth:
+            if j >= len(template):
+                return None
+            d = template[j]
+            if quote:
+                if d == '\\':
+                    j += 1
+                elif template.startswith(quote, j):
+                    j += len(quote) - 1
+                    quote = None
+            elif d in '\'"':
+                quote = d * 3 if template.startswith(d * 3, j) else d
+                j += len(quote) - 1
+            elif d in '([{':
+                depth += 1
+            elif d in ')]}':
+                depth -= 1
+            j += 1
+
+        key_thunk = split_interpolation(template[i + 1:j - 1])
+        if key_thunk.formatspec is not None and '{' in key_thunk.formatspec:
+            return None
+        if text:
+            keyed_args.append(Chunk(''.join(text)))
+            text = []
+        keyed_args.append(key_thunk)
+        i = j
+    if text:
+        keyed_args.append(Chunk(''.join(text)))
+    return tuple(keyed_args)
+
+
+def find_templates(source: str, tags: Iterable[str] = DEFAULT_TAGS) -> Iterator[tuple[int, tuple[Chunk | KeyThunk, ...]]]:
+    """Yield the line number and key of each tag string call site in source"""
+    tags = set(tags)
+    tokens = list(tokenize.generate_tokens(StringIO(source).readline))
+    for name, string in zip(tokens, tokens[1:]):
+        # A tag string is a name immediately followed by a string literal
+        if not (name.type == tokenize.NAME and name.string in tags and
+                string.type == tokenize.STRING and name.end == string.start):
+            continue
+        literal = string.string
+        quote = literal[:3] if literal[:3] in ('"""', "'''") else literal[0]
+        keyed_args = make_static_key(literal[len(quote):-len(quote)])
+        if keyed_args:
+            yield name.start[0], keyed_args
+
+
+def find_sources(targets: Iterable[str]) -> Iterator[Path]:
+    """Python files for each target, either a path or an importable package name"""
+    for target in targets:
+        path = Path(target)
+        if not path.exists():
+            spec = find_spec(target)
+            if spec is None or spec.origin is None:
+                raise ValueError(f'Cannot find {target!r}')
+            path = Path(spec.origin)
+            if spec.submodule_search_locations:
+                path = path.parent
+        if path.is_dir():
+            yield from sorted(path.rglob('*.py'))
+        else:
+            yield path
+
+
+def format_key(keyed_args: tuple[Chunk | KeyThunk, ...]) -> str:
+    args = []
+    for arg in keyed_args:
+        match arg:
+            case KeyThunk(conv, formatspec):
+                args.append(f'KeyThunk({conv!r}, {formatspec!r})')
+            case str():
+                args.append(f'Chunk({str(arg)!r})')
+    return f'({", ".join(args)},)'
+
+
+def precompile(paths: Iterable[Path], tags: Iterable[str] = DEFAULT_TAGS) -> str:
+    """Return the source of a module with renderers for all templates in paths"""
+    lines = [
+        '# Generated by fdom.precompile, do not edit',
+        '',
+        'from fdom.astparser import KeyThunk',
+        'from fdom.taglib import Chunk',
+        '',
+        f'FDOM_VERSION = {source_version()!r}',
+        '',
+        'TEMPLATES = {',
+        *(f'    {compiler_name(compiler)!r}: {{}},' for compiler in COMPILERS),
+        '}',
+    ]
+    seen = set()
+    for path in paths:
+        for lineno, keyed_args in find_templates(path.read_text(encoding='utf-8'), tags):
+            if keyed_args in seen:
+                continue
+            seen.add(keyed_args)
+            for compiler_class in COMPILERS:
+                try:
+                    compiler = compiler_class()
+                    compiler.compile(parse_keyed_template_as_ast(*keyed_args))
+                except Exception as e:
+                    print(f'{path}:{lineno}: skipping template: {e}', file=sys.stderr)
+                    break
+
+                # Generated code may define module level names of its own, so
+                # wrap each in a factory function to keep them apart
+                factory = f'_template{len(seen)}_{compiler_class.__name__}'
+                lines.extend([
+                    '',
+                    '',
+                    f'# {path}:{lineno}',
+                    f'def {factory}():',
+                    indent(compiler.code.strip(), '    '),
+                    f'    return {compiler.name}',
+                    '',
+                    '',
+                    f'TEMPLATES[{compiler_name(compiler_class)!r}][{format_key(keyed_args)}] = {factory}()',
+                ])
+    lines.append('')
+    return '\n'.join(lines)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog='fdom-precompile',
+        description='Compile html tag string templates ahead of time into an importable module.')
+    parser.add_argument('targets', nargs='+', help='source files, directories or package names to scan')
+    parser.add_argument('-o', '--output', required=True, help='path of the module to write')
+    parser.add_argument(
+        '-t', '--tag', action='append', dest='tags',
+        help=f'name of a tag function to scan for (default: {", ".join(DEFAULT_TAGS)})')
+    args = parser.parse_args(argv)
+
+    source = precompile(find_sources(args.targets), args.tags or DEFAULT_TAGS)
+    Path(args.output).write_text(source, encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
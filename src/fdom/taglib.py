@@ -15,7 +15,9 @@ class Chunk(str):
         does to perform the actual decode.
         """
         if self._decoded is None:
-            self._decoded = self.encode('utf-8').decode('unicode-escape')
+            # unicode-escape decodes bytes as latin-1, so escape anything
+            # beyond that rather than encoding it as UTF-8
+            self._decoded = self.encode('latin-1', 'backslashreplace').decode('unicode-escape')
         return self._decoded
 
 
@@ -0,0 +1,224 @@
+import warnings
+from collections import OrderedDict
+from collections.abc import Iterable
+from threading import Lock
+from time import perf_counter
+from types import ModuleType
+from typing import Callable
+
+from fdom.astparser import KeyThunk, make_key, parse_keyed_template_as_ast
+from fdom.basecompiler import BaseCompiler
+from fdom.caching import CacheInfo, SingleFlight
+from fdom.codecache import CodeCache, source_version
+from fdom.instrument import CompileEvent, compile_listeners
+from fdom.taglib import Chunk, Thunk
+
+
+"""
+Bounded cache of compiled templates.
+
+Entries are keyed on the compiler class plus the keyed args from make_key, so
+one cache can be shared by the HTML and fdom backends, with a single size bound
+and one set of statistics.
+
+In front of that is a second level keyed on call site identity. The static
+strings of a tag string are constants of the calling code object, so every call
+from the same call site passes the very same str objects. Keying on their id,
+plus the conv and formatspec of each interpolation, skips the conversion to
+Chunk, make_key, and hashing every static string on each call. Each site entry
+keeps a reference to the static strings it was keyed from, so no id in a live
+site key can be reused by another object, but not to the interpolations, so
+their values are not kept alive by the cache.
+
+On a miss, renderers precompiled by fdom.precompile are used first. Otherwise,
+an optional CodeCache persists the generated code across processes, and is
+consulted before parsing and generating code.
+
+The cache is safe to share between threads, including on free-threaded builds
+of CPython, with its entries and statistics guarded by a lock. Compiling is
+single flight: when many threads miss on the same template at once, such as
+just after a deploy, one of them compiles it while the others wait for it.
+"""
+
+
+class TemplateCache:
+    def __init__(self, maxsize: int = 1024, code_cache: CodeCache | None = None):
+        self.maxsize = maxsize
+        self.code_cache = code_cache
+        self.entries: OrderedDict[tuple, Callable] = OrderedDict()
+        self.sites: dict[tuple, tuple[tuple[str, ...], tuple]] = {}  # site key -> (strings, key)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.compile_time = 0.0
+        self.lock = Lock()
+        self.compiling = SingleFlight()
+        self.generation = 0  # counts clears, so that template handles can drop their renderers
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def cache_info(self) -> CacheInfo:
+        with self.lock:
+            return CacheInfo(
+                self.hits, self.misses, self.maxsize, len(self.entries),
+                evictions=self.evictions, compile_time=self.compile_time)
+
+    def clear(self) -> None:
+        """Remove all compiled templates and reset the statistics"""
+        with self.lock:
+            self.entries.clear()
+            self.sites.clear()
+            self.hits = self.misses = self.evictions = 0
+            self.compile_time = 0.0
+            self.generation += 1
+
+    def keys(self, compiler: type[BaseCompiler] | None = None) -> list[tuple[Chunk | KeyThunk, ...]]:
+        """Keyed args of the cached templates, suitable for passing to warm"""
+        with self.lock:
+            return [
+                keyed_args for entry_compiler, keyed_args in self.entries
+                if compiler is None or entry_compiler is compiler]
+
+    def warm(self, compiler: type[BaseCompiler], *templates: Iterable[Chunk | KeyThunk]) -> None:
+        """Compile templates, given as keyed args from make_key, ahead of use"""
+        for keyed_args in templates:
+            key = (compiler, tuple(keyed_args))
+            self.compile(key)
+
+    def get(self, compiler: type[BaseCompiler], keyed_args: Iterable[Chunk | KeyThunk]) -> Callable:
+        key = (compiler, tuple(keyed_args))
+        with self.lock:
+            compiled_template = self.entries.get(key)
+            if compiled_template is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return compiled_template
+        return self.compile(key)
+
+    def lookup(self, compiler: type[BaseCompiler], args: tuple) -> tuple[Callable, list[str | Thunk]]:
+        """Return the compiled template for this call site and args bound as thunks"""
+        site_key = [compiler]
+        strings = []
+        bound_args = []
+        for arg in args:
+            if isinstance(arg, str):
+                site_key.append(id(arg))
+                strings.append(arg)
+                bound_args.append(arg)
+            else:
+                site_key.append((arg[2], arg[3]))
+                bound_args.append(arg if isinstance(arg, Thunk) else Thunk._make(arg))
+        site_key = tuple(site_key)
+
+        site = self.sites.get(site_key)
+        if site is None:
+            key = (compiler, make_key(*args))
+            with self.lock:
+                if len(self.sites) >= self.maxsize:
+                    # Forget the oldest call site; dicts preserve insertion order
+                    del self.sites[next(iter(self.sites))]
+                self.sites[site_key] = (tuple(strings), key)
+        else:
+            key = site[1]
+
+        # The template itself may have since been evicted
+        with self.lock:
+            compiled_template = self.entries.get(key)
+            if compiled_template is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return compiled_template, bound_args
+        return self.compile(key), bound_args
+
+    def compile(self, key: tuple) -> Callable:
+        """Return the compiled template for key, compiling it unless another thread is"""
+        return self.compiling(key, self.find, self.add)
+
+    def find(self, key: tuple) -> Callable | None:
+        with self.lock:
+            return self.entries.get(key)
+
+    def add(self, key: tuple) -> Callable:
+        compiled_template = self.compile_template(key)
+        with self.lock:
+            self.entries[key] = compiled_template
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return compiled_template
+
+    def compile_template(self, key: tuple) -> Callable:
+        compiler, keyed_args = key
+        function = _precompiled.get(key)
+        if function is not None:
+            compiled_template = compiler().bind(function)
+        else:
+            start = parsed = generated = perf_counter()
+            code_obj = None
+            code_size = None
+            if self.code_cache is not None:
+                code_obj = self.code_cache.load(compiler, keyed_args)
+                parsed = generated = perf_counter()
+            if code_obj is None:
+                ast = parse_keyed_template_as_ast(*keyed_args)
+                parsed = perf_counter()
+                template_compiler = compiler()
+                code_obj = template_compiler.generate(ast)
+                code_size = len(template_compiler.code)
+                generated = perf_counter()
+                if self.code_cache is not None:
+                    self.code_cache.store(compiler, keyed_args, code_obj)
+            compiled_template = compiler().load(code_obj)
+            loaded = perf_counter()
+            with self.lock:
+                self.compile_time += loaded - start
+
+            if compile_listeners:
+                event = CompileEvent(
+                    compiler, keyed_args, parsed - start, generated - parsed,
+                    loaded - generated, code_size)
+                for listener in compile_listeners:
+                    listener(event)
+        return compiled_template
+
+
+# Renderer functions generated by fdom.precompile, shared by all caches
+
+_precompiled: dict[tuple, Callable] = {}
+
+
+def compiler_name(compiler: type[BaseCompiler]) -> str:
+    """Name of a compiler class, as used to key precompiled modules"""
+    return f'{compiler.__module__}.{compiler.__qualname__}'
+
+
+def register_precompiled(compiler: type[BaseCompiler], module: ModuleType) -> bool:
+    """Use the renderers for compiler in a module generated by fdom.precompile"""
+    if getattr(module, 'FDOM_VERSION', None) != source_version():
+        warnings.warn(
+            f'Ignoring precompiled templates in {module.__name__!r}, '
+            f'which were generated by a different version of fdom')
+        return False
+    for keyed_args, function in module.TEMPLATES.get(compiler_name(compiler), {}).items():
+        _precompiled[(compiler, keyed_args)] = function
+    return True
+
+
+# Shared by fdom.htmltag and fdom.fdom_htmltag
+
+_template_cache = TemplateCache()
+
+
+def get_template_cache() -> TemplateCache:
+    return _template_cache
+
+
+def set_template_cache(cache: TemplateCache) -> None:
+    """Use this cache for all tag functions, eg to share a configured size"""
+    global _template_cache
+    _template_cache = cache
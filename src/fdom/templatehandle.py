@@ -0,0 +1,205 @@
+from collections.abc import Iterable, Iterator, Sequence
+from contextlib import contextmanager
+from typing import Any, Callable
+
+from fdom.astparser import KeyThunk, make_key
+from fdom.basecompiler import BaseCompiler
+from fdom.htmlcompiler import (
+    AsyncHTMLCompiler, AsyncHTMLIterator, BytesHTMLCompiler, EagerHTMLCompiler, HTML, HTMLBytes, HTMLCompiler,
+    HTMLIterator, IncrementalHTMLCompiler)
+from fdom.taglib import Chunk, Thunk
+from fdom.templatecache import TemplateCache, get_template_cache
+
+
+"""
+Handles on templates, separating compiling a template from binding its values.
+
+    row = template'<tr><td>{name}</td><td>{price:.2f}</td></tr>'
+    row.render('Milk', 1.5)
+    table = row.render_many([('Milk', 1.5), ('Eggs', 3)])
+
+A handle is obtained once from the static parts of a template. The expressions
+in its template are never evaluated; they only name its interpolations. Values
+are instead given by position, one per interpolation in order.
+
+Each handle holds the renderer compiled for each backend it is used with, so
+rendering involves no keying or cache lookup. These renderers are dropped, and
+compiled again from the template cache, once that cache is cleared or replaced
+with set_template_cache. A handle keeps using its renderers if they are only
+evicted from the cache, since they remain correct. Args are also reused, holding a
+Slot for each interpolation, whose value is set for each render rather than
+wrapped in a thunk. Any compiler may be used with bind, so one handle can be
+shared by the HTML and fdom backends.
+"""
+
+
+class Slot:
+    """Stands in for the thunk of an interpolation, holding its current value"""
+
+    __slots__ = ('value', 'conv', 'formatspec')
+
+    def __init__(self, conv: str | None, formatspec: str | None):
+        self.value = None
+        self.conv = conv
+        self.formatspec = formatspec
+
+    def getvalue(self) -> Any:
+        return self.value
+
+
+class LiveRender:
+    """A render of a template that can be updated with new values
+
+    Only the parts of the output using values that changed, by identity or
+    equality, are rendered again, eg for a dashboard refreshed many times a
+    second with mostly the same data. So a list changed in place, rather than
+    replaced, is not seen as changed.
+    """
+
+    __slots__ = ('render_parts', 'args', 'slots', 'indices', 'parts')
+
+    def __init__(self, render_parts: Callable, args: list[Chunk | Slot], slots: list[Slot]):
+        self.render_parts = render_parts
+        self.args = args
+        self.slots = slots
+        self.indices = [i for i, arg in enumerate(args) if arg.__class__ is Slot]
+        self.parts = []
+        render_parts(args, self.parts, None)
+
+    def render(self) -> HTML:
+        return HTML(''.join(self.parts))
+
+    def update(self, *values: Any) -> HTML:
+        """Render with these values, one per interpolation as for Template.render"""
+        changed = set()
+        for slot, index, value in zip(self.slots, self.indices, values, strict=True):
+            old = slot.value
+            if value is not old and (value.__class__ is not old.__class__ or value != old):
+                slot.value = value
+                changed.add(index)
+        if changed:
+            self.render_parts(self.args, self.parts, changed)
+        return HTML(''.join(self.parts))
+
+
+class Template:
+    def __init__(self, keyed_args: Iterable[Chunk | KeyThunk]):
+        self.keyed_args = tuple(keyed_args)
+        self.compiled: dict[type[BaseCompiler], Callable] = {}
+        # The template cache, and its generation, that compiled was filled from
+        self.cache: TemplateCache | None = None
+        self.generation = 0
+        # Args not in use; a render takes one, so that handles can be used
+        # from multiple threads, or reentrantly
+        self.idle: list[tuple[list[Chunk | Slot], list[Slot]]] = []
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.keyed_args!r})'
+
+    def compile(self, compiler: type[BaseCompiler]) -> Callable:
+        cache = get_template_cache()
+        if cache is not self.cache or cache.generation != self.generation:
+            self.compiled = {}
+            self.cache = cache
+            self.generation = cache.generation
+        compiled_template = self.compiled.get(compiler)
+        if compiled_template is None:
+            compiled_template = self.compiled[compiler] = cache.get(compiler, self.keyed_args)
+        return compiled_template
+
+    def bind_slots(self) -> tuple[list[Chunk | Slot], list[Slot]]:
+        """Return args for this template, and the slots among them"""
+        args = []
+        slots = []
+        for arg in self.keyed_args:
+            if isinstance(arg, KeyThunk):
+                arg = Slot(arg.conv, arg.formatspec)
+                slots.append(arg)
+            args.append(arg)
+        return args, slots
+
+    def bind(self, compiler: type[BaseCompiler], *values: Any) -> Any:
+        """Call the template compiled by compiler with new args, eg for FdomCompiler"""
+        args, slots = self.bind_slots()
+        for slot, value in zip(slots, values, strict=True):
+            slot.value = value
+        return self.compile(compiler)(args)
+
+    @contextmanager
+    def slots(self) -> Iterator[tuple[list[Chunk | Slot], list[Slot]]]:
+        """Borrow idle args and their slots, for renders that complete in this context"""
+        try:
+            bound = self.idle.pop()
+        except IndexError:
+            bound = self.bind_slots()
+        try:
+            yield bound
+        finally:
+            # Release the values, which may be large
+            for slot in bound[1]:
+                slot.value = None
+            self.idle.append(bound)
+
+    def render_values(self, compiler: type[BaseCompiler], values: Sequence[Any]) -> Any:
+        """Render values with an eager compiler, borrowing idle args"""
+        render = self.compile(compiler)
+        # As slots, but inline for the common case of a single render
+        try:
+            args, slots = self.idle.pop()
+        except IndexError:
+            args, slots = self.bind_slots()
+        try:
+            for slot, value in zip(slots, values, strict=True):
+                slot.value = value
+            return render(args)
+        finally:
+            for slot in slots:
+                slot.value = None
+            self.idle.append((args, slots))
+
+    def render(self, *values: Any) -> HTML:
+        return self.render_values(EagerHTMLCompiler, values)
+
+    def bytes(self, *values: Any) -> HTMLBytes:
+        """Like render, but encoded as UTF-8"""
+        return self.render_values(BytesHTMLCompiler, values)
+
+    def iter(self, *values: Any) -> HTMLIterator:
+        """Lazily rendered fragment, as from html_iter"""
+        return self.bind(HTMLCompiler, *values)
+
+    def aiter(self, *values: Any) -> AsyncHTMLIterator:
+        """Lazily rendered async fragment, as from html_aiter"""
+        return self.bind(AsyncHTMLCompiler, *values)
+
+    def live(self, *values: Any) -> LiveRender:
+        """Render values, keeping the output in parts to update with new values"""
+        args, slots = self.bind_slots()
+        for slot, value in zip(slots, values, strict=True):
+            slot.value = value
+        return LiveRender(self.compile(IncrementalHTMLCompiler), args, slots)
+
+    def render_many(self, rows: Iterable[Sequence[Any]]) -> HTML:
+        """Render the template for each row of values, joined as one string"""
+        render = self.compile(EagerHTMLCompiler)
+        with self.slots() as (args, slots):
+            out = []
+            for values in rows:
+                for slot, value in zip(slots, values, strict=True):
+                    slot.value = value
+                out.append(render(args))
+            return HTML(''.join(out))
+
+    def iter_many(self, rows: Iterable[Sequence[Any]]) -> Iterator[HTML]:
+        """Stream the template rendered for each row of values"""
+        render = self.compile(HTMLCompiler)
+        args, slots = self.bind_slots()
+        for values in rows:
+            for slot, value in zip(slots, values, strict=True):
+                slot.value = value
+            yield from render(args)
+
+
+def template(*args: Chunk | Thunk) -> Template:
+    """Tag function returning a handle on its template"""
+    return Template(make_key(*args))
@@ -0,0 +1,275 @@
+from collections.abc import Iterable
+from html import escape
+from typing import Any, Callable, NamedTuple
+
+from fdom.htmlcompiler import HTML, check_valid_attribute_name, get_static_attribute
+
+
+"""
+Virtual DOM built by templates compiled with FdomCompiler, and diffing of two
+renders of the same template.
+
+    def Item(item):
+        return html'<li key={item.id} class={item.status}>{item.label}</li>'
+
+    page = html'<ul>{[Item(item) for item in items]}</ul>'
+    ...
+    changes = diff(page, html'<ul>{[Item(item) for item in items]}</ul>')
+    patch(changes)  # page now matches the new render
+
+A render returns a Rendered, holding its top level nodes plus a slot for each
+interpolation, with its value and a target: the part of the tree it set, such
+as an attribute of an element, or the region of children it filled. Static
+subtrees are built once, when the template is compiled, and shared by every
+render. So diffing only compares the values of the slots, and costs time in
+the number of interpolations rather than the size of the page.
+
+When any attribute of an element changes, all of its attributes are built
+again from the static attributes and the values of its slots, in template
+order, so that a dict spread over other attributes patches as it renders.
+
+Children are matched by key, from a key attribute, or else by position. A
+child rendered by the same template as its match is diffed in turn, and kept,
+so that its nodes can be moved rather than rebuilt. Changes are applied to the
+old render by patch, and could equally be applied to a real DOM by following
+their targets.
+"""
+
+
+class Element:
+    """An element, with children of elements, text, renders and regions"""
+
+    __slots__ = ('tag', 'attrs', 'children', 'key')
+    __match_args__ = ('tag', 'attrs', 'children')
+
+    def __init__(self, tag: str, attrs: dict[str, Any], children: list, key: Any = None):
+        self.tag = tag
+        self.attrs = attrs
+        self.children = children
+        self.key = key
+
+    def __eq__(self, other):
+        if other.__class__ is not Element:
+            return NotImplemented
+        return (self.tag == other.tag and self.attrs == other.attrs and
+                self.children == other.children and self.key == other.key)
+
+    __hash__ = None
+
+    def __repr__(self):
+        key = '' if self.key is None else f', key={self.key!r}'
+        return f'Element({self.tag!r}, {self.attrs!r}, {self.children!r}{key})'
+
+
+class Attribute(NamedTuple):
+    element: Element
+    name: str
+    build_attrs: Callable[[list], dict[str, Any]]  # all attributes of the element, from the slot values
+
+
+class Attributes(NamedTuple):
+    # spread from a dict, eg <div {attrs}>
+    element: Element
+    build_attrs: Callable[[list], dict[str, Any]]
+
+
+class Children(NamedTuple):
+    # a list in the children of an element, or the top level nodes
+    region: list
+
+
+class TagName(NamedTuple):
+    element: Element
+
+
+class Key(NamedTuple):
+    element: Element
+
+
+Target = Attribute | Attributes | Children | TagName | Key
+
+
+class Rendered:
+    """A render of a compiled template, with the value and target of each slot"""
+
+    __slots__ = ('template', 'nodes', 'values', 'targets')
+
+    def __init__(self, template: Callable, nodes: list, values: list, targets: list[Target]):
+        self.template = template
+        self.nodes = nodes
+        self.values = values
+        self.targets = targets
+
+    def __eq__(self, other):
+        if other.__class__ is not Rendered:
+            return NotImplemented
+        return self.template is other.template and self.nodes == other.nodes
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'Rendered({self.nodes!r})'
+
+    def __str__(self):
+        return to_html(self)
+
+
+class Change(NamedTuple):
+    rendered: Rendered
+    slot: int
+    value: Any
+    nodes: list | None  # for a Children target, the new contents of the region
+
+
+# Used by the generated code of FdomCompiler
+
+def set_attribute(attrs: dict[str, Any], name: str, value: Any):
+    # As with the HTML backends, False omits the attribute
+    if value is not False:
+        attrs[name] = value
+
+
+def set_attrs(attrs: dict[str, Any], value: Any):
+    match value:
+        case dict() as d:
+            for name, v in d.items():
+                check_valid_attribute_name(name)
+                set_attribute(attrs, name, v)
+        case _:
+            raise ValueError(f'Attributes must be a dict, not {type(value)!r}')
+
+
+def get_children(value: Any) -> list:
+    """Nodes of an interpolated child value, with any iterables flattened"""
+    match value:
+        case str() | Element() | Rendered():
+            return [value]
+        case Iterable():
+            nodes = []
+            for item in value:
+                nodes.extend(get_children(item))
+            return nodes
+        case _:
+            return [str(value)]
+
+
+def get_key(node: Any) -> Any:
+    match node:
+        case Element():
+            return node.key
+        case Rendered():
+            for child in node.nodes:
+                if child.__class__ is Element:
+                    return (node.template, child.key) if child.key is not None else None
+    return None
+
+
+def same(old: Any, new: Any) -> bool:
+    # Exact types, so that eg 1 and True differ
+    return old is new or (old.__class__ is new.__class__ and old == new)
+
+
+def diff(old: Rendered, new: Rendered) -> list[Change]:
+    """Changes to old, so that once patched it matches new"""
+    if old.template is not new.template:
+        raise ValueError('Can only diff renders of the same template')
+    changes = []
+    diff_slots(old, new, changes)
+    return changes
+
+
+def diff_slots(old: Rendered, new: Rendered, changes: list[Change]):
+    for slot, target in enumerate(old.targets):
+        old_value = old.values[slot]
+        new_value = new.values[slot]
+        if target.__class__ is Children:
+            # Only text can be skipped, since eg a list may have changed in place
+            if old_value.__class__ is str and same(old_value, new_value):
+                continue
+            region = target.region
+            nodes = reconcile(region, get_children(new_value), changes)
+            if len(nodes) != len(region) or any(a is not b for a, b in zip(nodes, region)):
+                changes.append(Change(old, slot, new_value, nodes))
+        elif not same(old_value, new_value):
+            changes.append(Change(old, slot, new_value, None))
+
+
+def reconcile(old_nodes: list, new_nodes: list, changes: list[Change]) -> list:
+    """Match new nodes with old, by key or else position, reusing old nodes"""
+    keyed = {}
+    unkeyed = []
+    for node in old_nodes:
+        key = get_key(node)
+        if key is None:
+            unkeyed.append(node)
+        else:
+            keyed[key] = node
+    unkeyed.reverse()
+
+    nodes = []
+    for node in new_nodes:
+        key = get_key(node)
+        if key is None:
+            old = unkeyed.pop() if unkeyed else None
+        else:
+            old = keyed.pop(key, None)
+        nodes.append(node if old is None else update(old, node, changes))
+    return nodes
+
+
+def update(old: Any, new: Any, changes: list[Change]) -> Any:
+    # Return old, if it can be changed to match new, or else new
+    if old.__class__ is Rendered and new.__class__ is Rendered and old.template is new.template:
+        diff_slots(old, new, changes)
+        return old
+    if same(old, new):
+        return old
+    return new
+
+
+def patch(changes: Iterable[Change]):
+    """Apply changes from diff to the render they were made from"""
+    # Attributes may override each other, eg a dict spread over a static
+    # class, so are built again for each element once its slots are updated
+    build = {}
+    for rendered, slot, value, nodes in changes:
+        match rendered.targets[slot]:
+            case Attribute(element, _, build_attrs) | Attributes(element, build_attrs):
+                build[id(element)] = (element, build_attrs, rendered.values)
+            case Children(region):
+                region[:] = nodes
+            case TagName(element):
+                element.tag = value
+            case Key(element):
+                element.key = value
+        rendered.values[slot] = value
+    for element, build_attrs, values in build.values():
+        element.attrs = build_attrs(values)
+
+
+def to_html(node: Any) -> HTML:
+    """Serialize nodes as HTML, eg for the first render of a page"""
+    out = []
+    write_html(node, out)
+    return HTML(''.join(out))
+
+
+def write_html(node: Any, out: list[str]):
+    match node:
+        case HTML():
+            out.append(node)
+        case str():
+            out.append(escape(node))
+        case Element(tag, attrs, children):
+            out.append(f'<{tag}')
+            for name, value in attrs.items():
+                out.append(get_static_attribute(name, value))
+            out.append('>')
+            for child in children:
+                write_html(child, out)
+            out.append(f'</{tag}>')
+        case Rendered():
+            write_html(node.nodes, out)
+        case list():
+            for child in node:
+                write_html(child, out)
@@ -0,0 +1,9 @@
+import pytest
+
+from fdom.astparser import make_key
+
+
+@pytest.fixture
+def keyed():
+    """Tag function returning the keyed args of a template, as from make_key"""
+    return make_key
@@ -0,0 +1,68 @@
+import asyncio
+
+from fdom.asgi import send_html
+from fdom.htmltag import html_aiter, html_iter
+
+
+async def rows(n):
+    for i in range(n):
+        await asyncio.sleep(0)
+        yield html_iter'<li>{i}</li>'
+
+
+async def fetch_title():
+    await asyncio.sleep(0)
+    return 'Rows & more'
+
+
+def render(fragment, **kwargs):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(send_html(send, fragment, **kwargs))
+    return messages
+
+
+def test_html_aiter():
+    async def collect():
+        return [part async for part in html_aiter'<h1 title={fetch_title()}>{fetch_title()}</h1><ul>{rows(2)}</ul>']
+
+    assert ''.join(asyncio.run(collect())) == \
+        '<h1 title="Rows &amp; more">Rows &amp; more</h1><ul><li>0</li><li>1</li></ul>'
+
+
+def test_nested_async_fragments():
+    def Rows(n):
+        return html_aiter'<ul>{rows(n)}</ul>'
+
+    async def collect():
+        return ''.join([part async for part in html_aiter'<main>{Rows(1)}</main>'])
+
+    assert asyncio.run(collect()) == '<main><ul><li>0</li></ul></main>'
+
+
+def test_send_html():
+    messages = render(html_aiter'<p>{fetch_title()}</p>')
+    assert messages[0] == {
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'text/html; charset=utf-8')],
+    }
+    assert b''.join(message['body'] for message in messages[1:]) == b'<p>Rows &amp; more</p>'
+    assert [message['more_body'] for message in messages[1:]] == [True, False]
+
+
+def test_send_html_flushes_before_waiting():
+    # Output before the async iterable is sent first, then the rest is sent in
+    # chunks of at least chunk_size characters
+    messages = render(html_aiter'<ul>{rows(4)}</ul>', chunk_size=20)
+    assert [message['body'] for message in messages[1:]] == [
+        b'<ul>', b'<li>0</li><li>1</li>', b'<li>2</li><li>3</li>', b'</ul>']
+
+
+def test_send_html_sync():
+    messages = render(html_iter'<p>{"x" * 10}</p>', chunk_size=8, headers=[(b'x-fdom', b'1')])
+    assert messages[0]['headers'][-1] == (b'x-fdom', b'1')
+    assert [message['body'] for message in messages[1:]] == [b'<p>xxxxxxxxxx', b'</p>']
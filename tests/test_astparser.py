@@ -1,3 +1,5 @@
+import pytest
+
 from fdom.taglib import Thunk
 
 from fdom.astparser import (
@@ -6,6 +8,7 @@ from fdom.astparser import (
     escape_placeholder,
     unescape_placeholder,
     ASTParser,
+    HTMLParserASTParser,
     Interpolation,
     Tag,
     )
@@ -98,6 +101,13 @@ def test_ast_parser_construction():
     assert ast.root.attrs == []
     assert ast.root.children == []
     assert ast.stack == [ast.root]
+    assert ast.segments == []
+
+
+def test_html_parser_ast_parser_construction():
+    ast = HTMLParserASTParser()
+    assert ast.root.tagname is None
+    assert ast.stack == [ast.root]
     assert list(ast.interpolations) == []
 
 
@@ -124,3 +134,90 @@ def test_unescape_placeholder_one():
 def test_make_key_multiple_strings():
     result = make_key('Hello', 'World')
     assert result == ('Hello', 'World')
+
+
+def parse_with(parser_class, *args):
+    parser = parser_class()
+    for i, arg in enumerate(make_key(*args)):
+        parser.feed(i, arg)
+    return parser.result()
+
+
+def as_legacy_ast(*args):
+    return parse_with(HTMLParserASTParser, *args)
+
+
+def test_same_ast_as_html_parser():
+    level, style, text, attrs, action, alert, tag, x, y = range(9)
+    templates = [
+        as_legacy_ast'<input readonly placeholder="Favorite color">Blue</input>',
+        as_legacy_ast'<div style={style}>some {text}</div>',
+        as_legacy_ast'<h{level}>Heading at {level}: some {text}</h{level}>',
+        as_legacy_ast'<{x}{y}bar>foo</{x}{y}bar>',
+        as_legacy_ast'<div {attrs} class="a &amp; b" on{action}="{alert}"/>',
+        as_legacy_ast'<DIV Class=Upper>&lt;Text&gt;<!-- comment --></DIV>',
+        as_legacy_ast'<!DOCTYPE html><html><body><p>{text}</p></body></html>',
+        as_legacy_ast'<script>if (a < b && c) {{ go() }}</script>',
+        as_legacy_ast"""<ul>
+            <li class="item">{text}</li>
+        </ul>""",
+    ]
+    asts = [
+        as_ast'<input readonly placeholder="Favorite color">Blue</input>',
+        as_ast'<div style={style}>some {text}</div>',
+        as_ast'<h{level}>Heading at {level}: some {text}</h{level}>',
+        as_ast'<{x}{y}bar>foo</{x}{y}bar>',
+        as_ast'<div {attrs} class="a &amp; b" on{action}="{alert}"/>',
+        as_ast'<DIV Class=Upper>&lt;Text&gt;<!-- comment --></DIV>',
+        as_ast'<!DOCTYPE html><html><body><p>{text}</p></body></html>',
+        as_ast'<script>if (a < b && c) {{ go() }}</script>',
+        as_ast"""<ul>
+            <li class="item">{text}</li>
+        </ul>""",
+    ]
+    assert asts == templates
+
+
+def test_parse_interpolation_within_attribute_value():
+    template = as_ast'<div class="item {extra} last">x</div>'
+    assert template == \
+        Tag(tagname=['div'],
+            attrs=[(['class'], ['item ', Interpolation(index=1, conv=None, formatspec=None), ' last'])],
+            children=['x'])
+
+
+def test_parse_less_than_in_data():
+    template = as_ast'<p>a < b <!-- {dropped} --> c</p>'
+    assert template == Tag(tagname=['p'], attrs=[], children=['a < b  c'])
+
+
+def test_parse_mismatched_end_tag():
+    with pytest.raises(ValueError) as excinfo:
+        as_ast'<div>text</span>'
+    assert str(excinfo.value) == "Start tag 'div' does not match end tag 'span'"
+
+
+def test_tag_is_immutable():
+    template = as_ast'<div class="a">Hello</div>'
+    with pytest.raises(AttributeError):
+        template.children = ()
+    assert template.tagname == ('div',)
+    assert template.attrs == ((('class',), ('a',)),)
+    assert hash(template) == hash(as_ast'<div class="a">Hello</div>')
+
+
+def test_tag_flags():
+    template = as_ast'<h{level}><span class="x">Heading</span> {text}</h{level}>'
+    assert not template.static_tagname
+    assert template.has_interpolations
+    assert not template.static
+
+    span = template.children[0]
+    assert span.static_tagname
+    assert not span.has_interpolations
+    assert span.static
+
+    template = as_ast'<ul><li>{item}</li></ul>'
+    assert template.static_tagname
+    assert not template.has_interpolations
+    assert not template.static
@@ -0,0 +1,56 @@
+from fdom import templatecache
+from fdom.codecache import CodeCache
+from fdom.htmlcompiler import HTMLCompiler
+from fdom.templatecache import TemplateCache
+
+
+def render(compiled_template, *args):
+    return ''.join(compiled_template(list(args)))
+
+
+def test_load_without_parsing(tmp_path, monkeypatch, keyed):
+    key = keyed'<div class="greeting">Hello</div>'
+    compiled_template = TemplateCache(code_cache=CodeCache(tmp_path)).get(HTMLCompiler, key)
+
+    # A fresh cache, as in a newly forked process, must not parse again
+    def fail(*args):
+        raise AssertionError('Template was parsed')
+
+    monkeypatch.setattr(templatecache, 'parse_keyed_template_as_ast', fail)
+    loaded = TemplateCache(code_cache=CodeCache(tmp_path)).get(HTMLCompiler, key)
+    assert loaded is not compiled_template
+    assert render(loaded) == render(compiled_template) == '<div class="greeting">Hello</div>'
+
+
+def test_version_invalidates(tmp_path, keyed):
+    key = keyed'<p>Hello</p>'
+    old = CodeCache(tmp_path, version='old')
+    TemplateCache(code_cache=old).get(HTMLCompiler, key)
+    assert old.load(HTMLCompiler, key) is not None
+
+    new = CodeCache(tmp_path, version='new')
+    assert new.load(HTMLCompiler, key) is None
+
+    new.prune()
+    assert [path.name for path in tmp_path.iterdir()] == []
+
+
+def test_corrupt_entry_is_a_miss(tmp_path, keyed):
+    key = keyed'<p>Hello</p>'
+    code_cache = CodeCache(tmp_path)
+    TemplateCache(code_cache=code_cache).get(HTMLCompiler, key)
+    path = code_cache.path(code_cache.key_text(HTMLCompiler, key))
+    path.write_bytes(path.read_bytes()[:10])
+    assert code_cache.load(HTMLCompiler, key) is None
+
+    compiled_template = TemplateCache(code_cache=code_cache).get(HTMLCompiler, key)
+    assert render(compiled_template) == '<p>Hello</p>'
+    assert code_cache.load(HTMLCompiler, key) is not None
+
+
+def test_clear(tmp_path, keyed):
+    key = keyed'<p>Hello</p>'
+    code_cache = CodeCache(tmp_path)
+    TemplateCache(code_cache=code_cache).get(HTMLCompiler, key)
+    code_cache.clear()
+    assert code_cache.load(HTMLCompiler, key) is None
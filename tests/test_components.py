@@ -0,0 +1,78 @@
+from fdom import components
+from fdom.components import CacheInfo, memoize
+from fdom.htmlcompiler import HTML
+from fdom.htmltag import html
+
+
+def test_memoize():
+    calls = []
+
+    @memoize
+    def Badge(label, level=1):
+        calls.append(label)
+        return html'<span class="badge-{level}">{label}</span>'
+
+    assert Badge('new') == '<span class="badge-1">new</span>'
+    assert Badge('new') is Badge('new')
+    assert Badge('new', level=2) == '<span class="badge-2">new</span>'
+    assert calls == ['new', 'new']
+    assert Badge.cache_info() == CacheInfo(hits=2, misses=2, expired=0, maxsize=256, currsize=2)
+    assert Badge.__name__ == 'Badge'
+
+    Badge.cache_clear()
+    assert Badge.cache_info() == CacheInfo(0, 0, 256, 0)
+
+
+def test_memoize_lru():
+    @memoize(maxsize=2)
+    def Item(label):
+        return html'<li>{label}</li>'
+
+    Item('a')
+    Item('b')
+    Item('a')
+    Item('c')  # evicts b, the least recently used
+    assert list(Item.entries) == [('a', str), ('c', str)]
+
+
+def test_memoize_typed():
+    @memoize
+    def Cell(value, title=''):
+        return html'<td title={title}>{value}</td>'
+
+    assert Cell(1) == '<td title="">1</td>'
+    assert Cell(True) == '<td title="">True</td>'
+    assert Cell(1.0) == '<td title="">1.0</td>'
+    assert Cell(1, title=True) == '<td title>1</td>'
+    assert Cell(1, title=1) == '<td title="1">1</td>'
+
+    # HTML is equal to the same str, which must still be escaped
+    assert Cell(HTML('<b>x</b>')) == '<td title=""><b>x</b></td>'
+    assert Cell('<b>x</b>') == '<td title="">&lt;b&gt;x&lt;/b&gt;</td>'
+    assert Cell.cache_info().currsize == 7
+
+
+def test_memoize_ttl(monkeypatch):
+    now = 100.0
+    monkeypatch.setattr(components, 'monotonic', lambda: now)
+
+    @memoize(ttl=10)
+    def Clock(label):
+        return html'<time>{label}</time>'
+
+    first = Clock('noon')
+    now = 105.0
+    assert Clock('noon') is first
+    now = 111.0
+    assert Clock('noon') is not first
+    assert Clock.cache_info()[:2] == (1, 2)
+    assert Clock.cache_info().expired == 1
+
+
+def test_memoize_unhashable():
+    @memoize
+    def List(items):
+        return html'<ul class="list">{items}</ul>'
+
+    assert List(['a', 'b']) == '<ul class="list">ab</ul>'
+    assert List.cache_info().currsize == 0
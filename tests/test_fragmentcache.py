@@ -0,0 +1,136 @@
+import threading
+import time
+
+import pytest
+
+from fdom.caching import CacheInfo
+from fdom.fragmentcache import FileBackend, FragmentCache, MemoryBackend
+from fdom.htmlcompiler import HTML
+from fdom.templatehandle import template
+
+
+menu = template'<nav>{labels}</nav>'
+
+
+def test_render():
+    fragments = FragmentCache()
+    assert fragments.render(menu, ('Home', 'About')) == '<nav>HomeAbout</nav>'
+    assert fragments.render(menu, ('Home', 'About')) == '<nav>HomeAbout</nav>'
+    assert fragments.render(menu, ('Home',)) == '<nav>Home</nav>'
+    assert fragments.cache_info() == CacheInfo(hits=1, misses=2)
+
+
+def test_render_with_key():
+    fragments = FragmentCache()
+    # Cached on the key, so the values need not be hashable
+    assert fragments.render(menu, ['Home'], key='guest') == '<nav>Home</nav>'
+    assert fragments.render(menu, ['Home', 'Admin'], key='guest') == '<nav>Home</nav>'
+    assert fragments.render(menu, ['Home', 'Admin'], key='admin') == '<nav>HomeAdmin</nav>'
+
+
+def test_render_default_repr():
+    # Objects with the default repr, which gives an id that can be reused
+    # once the object is freed
+    class User:
+        def __init__(self, name):
+            self.name = name
+
+        def __str__(self):
+            return self.name
+
+    fragments = FragmentCache()
+    assert fragments.render(menu, User('Alice')) == '<nav>Alice</nav>'
+    assert fragments.render(menu, User('Bob')) == '<nav>Bob</nav>'
+    assert fragments.render(menu, User('Carol')) == '<nav>Carol</nav>'
+
+
+def test_render_typed():
+    fragments = FragmentCache()
+    assert fragments.render(menu, 1) == '<nav>1</nav>'
+    assert fragments.render(menu, True) == '<nav>True</nav>'
+    assert fragments.render(menu, 1.0) == '<nav>1.0</nav>'
+
+    # HTML is equal to the same str, which must still be escaped
+    assert fragments.render(menu, HTML('<b>x</b>')) == '<nav><b>x</b></nav>'
+    assert fragments.render(menu, '<b>x</b>') == '<nav>&lt;b&gt;x&lt;/b&gt;</nav>'
+    assert len(fragments.backend) == 5
+
+
+def test_render_unhashable():
+    fragments = FragmentCache()
+    with pytest.raises(TypeError):
+        fragments.render(menu, ['Home'])
+
+
+def test_memory_backend_bounded():
+    backend = MemoryBackend(maxsize=2, max_chars=10)
+    backend.set('a', 'aaaa', None)
+    backend.set('b', 'bbbb', None)
+    backend.get('a')
+    backend.set('c', 'cccc', None)  # evicts b, the least recently used
+    assert list(backend.entries) == ['a', 'c']
+    backend.set('d', 'dddddddd', None)  # evicts both, to fit in max_chars
+    assert list(backend.entries) == ['d']
+    assert backend.chars == 8
+    backend.set('e', 'e' * 11, None)  # too large to cache at all
+    assert backend.get('e') is None
+
+
+def test_memory_backend_ttl():
+    backend = MemoryBackend()
+    backend.set('a', 'aaaa', -1)
+    assert backend.get('a') is None
+    assert len(backend) == 0
+
+
+def test_file_backend(tmp_path):
+    fragments = FragmentCache(FileBackend(tmp_path))
+    assert fragments.render(menu, ('Home',), key='home') == '<nav>Home</nav>'
+
+    # Shared with another process, eg
+    fragments = FragmentCache(FileBackend(tmp_path))
+    assert fragments.render(menu, ('Home',), key='home') == '<nav>Home</nav>'
+    assert fragments.cache_info() == CacheInfo(hits=1, misses=0)
+
+    fragments = FragmentCache(FileBackend(tmp_path), ttl=-1)
+    fragments.render(menu, ('Home',), key='expired')
+    assert fragments.render(menu, ('Home',), key='expired') == '<nav>Home</nav>'
+    assert fragments.cache_info() == CacheInfo(hits=0, misses=2)
+
+    fragments.clear()
+    assert list(tmp_path.iterdir()) == []
+
+    # Keyed on the values, whose repr may differ between processes
+    with pytest.raises(TypeError):
+        fragments.render(menu, ('Home',))
+
+
+def test_file_backend_corrupt(tmp_path):
+    backend = FileBackend(tmp_path)
+    backend.path('menu').write_text('soon\nmenu\n<nav></nav>', encoding='utf-8')
+    assert backend.get('menu') is None
+
+
+def test_stampede():
+    fragments = FragmentCache()
+    renders = []
+    barrier = threading.Barrier(8)
+    results = []
+
+    def render():
+        renders.append(1)
+        time.sleep(0.05)
+        return '<footer>Slow</footer>'
+
+    def request():
+        barrier.wait()
+        results.append(fragments.get_or_render('footer', render))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ['<footer>Slow</footer>'] * 8
+    assert len(renders) == 1
+    assert len(fragments.rendering) == 0
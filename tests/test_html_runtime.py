@@ -1,6 +1,6 @@
 import pytest
 
-from fdom.htmlcompiler import HTMLRuntimeMixin
+from fdom.htmlcompiler import HTML, HTMLRuntimeMixin, format_style, get_attribute_writer
 from fdom.taglib import Thunk
 
 
@@ -87,3 +87,57 @@ def test_invalid_attribute_name():
     with pytest.raises(ValueError) as excinfo:
         mixin.check_valid_attribute_name('123')
     assert str(excinfo.value) == "Invalid attribute name: '123'"
+
+
+def test_unpack_value():
+    mixin = HTMLRuntimeMixin([])
+    assert list(mixin.unpack_value('<b>', '')) == ['&lt;b&gt;']
+    assert list(mixin.unpack_value('<b>', '>5')) == ['  &lt;b&gt;']
+    assert list(mixin.unpack_value(42, '')) == ['42']
+    assert list(mixin.unpack_value(1.5, '.2f')) == ['1.50']
+    assert list(mixin.unpack_value(5, '&>3')) == ['&amp;&amp;5']
+    assert list(mixin.unpack_value(True, '')) == ['True']
+    assert list(mixin.unpack_value(None, '')) == ['None']
+    assert list(mixin.unpack_value(HTML('<b>'), '')) == ['<b>']
+
+
+def test_unpack_value_iterables():
+    mixin = HTMLRuntimeMixin([])
+    # flat lists of strings are joined
+    assert list(mixin.unpack_value(['<a>', '<b>'], '')) == ['&lt;a&gt;&lt;b&gt;']
+    assert list(mixin.unpack_value([HTML('<a>'), HTML('<b>')], '')) == ['<a><b>']
+    assert list(mixin.unpack_value([HTML('<a>'), '<b>'], '')) == ['<a>&lt;b&gt;']
+    assert list(mixin.unpack_value(['a', 'b'], '>2')) == [' a', ' b']
+    # anything else is flattened in order
+    assert list(mixin.unpack_value([1, ['<a>', (2, iter([HTML('<b>'), 3]))], 4], '')) == [
+        '1', '&lt;a&gt;', '2', '<b>', '3', '4']
+    deeply_nested = 'x'
+    for _ in range(5000):
+        deeply_nested = [deeply_nested, 1]
+    assert len(list(mixin.unpack_value(deeply_nested, ''))) == 5001
+
+
+def test_attribute_writer_per_shape():
+    mixin = HTMLRuntimeMixin([])
+    row = {'class': 'row', 'data-index': 1, 'hidden': False, 'selected': True, 'title': '"a" & b'}
+    assert mixin.get_attrs(row) == ' class="row" data-index="1" selected title="&quot;a&quot; &amp; b"'
+    assert get_attribute_writer(tuple(row)) is get_attribute_writer(('class', 'data-index', 'hidden', 'selected', 'title'))
+    # same keys, in another order, is another shape
+    assert mixin.get_attrs({'title': 't', 'class': 'c'}) == ' title="t" class="c"'
+    assert mixin.get_attrs({}) == ''
+    with pytest.raises(ValueError):
+        mixin.get_attrs({'1a': 'x'})
+    with pytest.raises(ValueError):
+        mixin.get_attrs(['class'])
+
+
+def test_style_attribute():
+    mixin = HTMLRuntimeMixin([])
+    assert mixin.get_attrs({'style': {'color': 'red', 'content': '"x"'}}) == \
+        ' style="color: red; content: &quot;x&quot;"'
+    assert format_style({'margin': [0, 1]}) == 'margin: [0, 1]'
+    # Cached by type, as equal values may format differently
+    assert mixin.get_attrs({'style': {'opacity': 1}}) == ' style="opacity: 1"'
+    assert mixin.get_attrs({'style': {'opacity': 1.0}}) == ' style="opacity: 1.0"'
+    assert mixin.get_attrs({'style': {'opacity': True}}) == ' style="opacity: True"'
+    assert mixin.get_attrs({'style': 'color: red'}) == ' style="color: red"'
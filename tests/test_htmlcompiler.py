@@ -0,0 +1,144 @@
+import pytest
+
+from fdom.astparser import as_ast
+from fdom.fdomcompiler import FdomCompiler
+from fdom.htmlcompiler import (
+    BytesHTMLCompiler, EagerHTMLCompiler, HTML, HTMLCompiler, IncrementalHTMLCompiler, join_value, unpack_value)
+from fdom.taglib import Thunk
+
+
+def compile_code(tag, compiler_class=HTMLCompiler):
+    compiler = compiler_class()
+    compiler.compile(tag)
+    return compiler
+
+
+def test_fold_static_subtree():
+    compiler = compile_code(as_ast"""<nav class="main">
+        <ul><li><a href="/">Home</a></li><li><a href="/about">About</a></li></ul>
+        <p>Hello, {name}</p>
+    </nav>""")
+    assert list(compiler.constants) == [
+        '<nav class="main">\n'
+        '        <ul><li><a href="/">Home</a></li><li><a href="/about">About</a></li></ul>\n'
+        '        <p>Hello, ',
+        '</p>\n    </nav>',
+    ]
+    assert compiler.lines[-7:] == [
+        '    yield _static0',
+        '    _value = args[1].getvalue()',
+        '    if _value.__class__ is str:',
+        '        yield HTML(escape(_value))',
+        '    else:',
+        '        yield from unpack_value(_value, \'\')',
+        '    yield _static1',
+    ]
+
+
+def test_fold_escapes_static_content():
+    compiler = compile_code(as_ast'<div title="Tom &amp; &quot;Jerry&quot;">&lt;b&gt; &amp; more</div>')
+    assert list(compiler.constants) == [
+        '<div title="Tom &amp; &quot;Jerry&quot;">&lt;b&gt; &amp; more</div>']
+
+
+def test_multiple_top_level_nodes():
+    compiler = compile_code(as_ast'<p>a</p> <p>{b}</p>')
+    assert list(compiler.constants) == ['<p>a</p> <p>', '</p>']
+
+
+def test_eager_compiler():
+    compiler = compile_code(as_ast'<ul title={title}>{items}</ul>', EagerHTMLCompiler)
+    assert compiler.lines[-11:] == [
+        '    _value = args[1].getvalue()',
+        '    if _value.__class__ is str:',
+        '        _p0 = f\' title="{escape(_value)}"\'',
+        '    else:',
+        "        _p0 = get_static_attribute('title', _value)",
+        '    _value = args[3].getvalue()',
+        '    if _value.__class__ is str:',
+        '        _p1 = escape(_value)',
+        '    else:',
+        "        _p1 = join_value(_value, '')",
+        "    return HTML('<ul' f'{_p0}' '>' f'{_p1}' '</ul>')",
+    ]
+
+    args = [None, Thunk(lambda: 'a&b', 'title'), None, Thunk(lambda: [HTML('<li>1</li>'), 2], 'items'), None]
+    renderer = EagerHTMLCompiler()(as_ast'<ul title={title}>{items}</ul>')
+    result = renderer(args)
+    assert result == '<ul title="a&amp;b"><li>1</li>2</ul>'
+    assert isinstance(result, HTML)
+
+    # Static text is a literal of the f-string, so braces are not fields
+    renderer = EagerHTMLCompiler()(as_ast'<p class="{{x}}">{{y}} {z}</p>')
+    assert renderer([None, Thunk(lambda: '{z}', 'z'), None]) == '<p class="{x}">{y} {z}</p>'
+
+
+@pytest.mark.parametrize('value, fspec', [
+    ([HTML('<li>1</li>'), HTML('<li>2</li>')], ''),
+    ((HTML('<li>1</li>'),), ''),
+    ([], ''),
+    (['<b>', HTML('<i>')], ''),
+    ([1.5, [HTML('<br>')]], '.2f'),
+    (1.5, '.2f'),
+    (3, ''),
+    (True, ''),
+    (None, ''),
+])
+def test_join_value(value, fspec):
+    assert join_value(value, fspec) == ''.join(unpack_value(value, fspec))
+
+
+def test_bytes_compiler():
+    compiler = compile_code(as_ast'<p title="Café">{label}</p>', BytesHTMLCompiler)
+    assert compiler.lines[-6:] == [
+        '    _value = args[1].getvalue()',
+        '    if _value.__class__ is str:',
+        '        _p0 = escape(_value).encode()',
+        '    else:',
+        "        _p0 = b''.join(unpack_bytes(_value, ''))",
+        "    return HTMLBytes(b''.join([b'<p title=\"Caf\\xc3\\xa9\">', _p0, b'</p>']))",
+    ]
+
+    renderer = BytesHTMLCompiler()(as_ast'<p title="Café">{label}</p>')
+    result = renderer([None, Thunk(lambda: 'Crème & brûlée', 'label'), None])
+    assert result == '<p title="Café">Crème &amp; brûlée</p>'.encode()
+
+    renderer = BytesHTMLCompiler()(as_ast'<a href={href} hidden={hidden}>{price:.2f}{label!r}</a>')
+    result = renderer([
+        None, Thunk(lambda: '/crème', 'href'), None, Thunk(lambda: False, 'hidden'), None,
+        Thunk(lambda: 1.5, 'price', None, '.2f'), Thunk(lambda: 'é', 'label', 'r'), None])
+    assert result == '<a href="/crème">1.50&#x27;é&#x27;</a>'.encode()
+
+
+def test_incremental_compiler():
+    compiler = compile_code(as_ast'<li class="{a} {b}">{label!r}</li>', IncrementalHTMLCompiler)
+    assert compiler.lines[-9:] == [
+        '    if changed is None or not changed.isdisjoint((1, 3)):',
+        "        _append(get_static_attribute('class', ''.join([str(args[1].getvalue()), ' ', str(args[3].getvalue())])))",
+        "        parts[1] = ''.join(_out)",
+        '        _out.clear()',
+        '    if changed is None or 5 in changed:',
+        '        _append(escape(repr(args[5].getvalue())))',
+        "        parts[3] = ''.join(_out)",
+        '        _out.clear()',
+        '    return parts',
+    ]
+    assert compiler.code.endswith('\n_layout = (_static0, None, _static1, None, _static2,)')
+
+
+def test_static_attribute_name_validated_when_compiled():
+    with pytest.raises(ValueError) as excinfo:
+        compile_code(as_ast'<div 1a={x}></div>')
+    assert str(excinfo.value) == "Invalid attribute name: '1a'"
+
+
+@pytest.mark.parametrize('compiler_class', [HTMLCompiler, EagerHTMLCompiler, FdomCompiler])
+def test_static_names_validated_when_compiled(compiler_class):
+    with pytest.raises(ValueError, match="Invalid attribute name: '1a'"):
+        compile_code(as_ast'<div 1a="x">{x}</div>', compiler_class)
+    with pytest.raises(ValueError, match="Invalid attribute name: '1a'"):
+        compile_code(as_ast'<p>{x}<div 1a>static</div></p>', compiler_class)
+    with pytest.raises(ValueError, match="Invalid tag name: 'my--tag'"):
+        compile_code(as_ast'<my--tag>{x}</my--tag>', compiler_class)
+    with pytest.raises(ValueError, match="Invalid tag name: 'my--tag'"):
+        compile_code(as_ast'<my--tag>static</my--tag>', compiler_class)
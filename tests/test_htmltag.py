@@ -1,4 +1,8 @@
-from fdom.htmltag import html, html_iter, HTML
+import pytest
+
+from fdom.htmlcompiler import HTMLIterator
+from fdom.htmltag import FLUSH, html, html_aiter, html_bytes, html_iter, HTML, HTMLBytes
+from fdom.templatecache import get_template_cache
 
 
 def test_simple():
@@ -60,6 +64,32 @@ def test_listing_iter():
     </html>"""
 
 
+def test_fragment_is_lazy():
+    calls = []
+
+    def label():
+        calls.append('label')
+        return 'Get milk'
+
+    fragment = html_iter'<li>{label()}</li>'
+    assert isinstance(fragment, HTMLIterator)
+    assert calls == []
+    assert list(fragment) == ['<li>', 'Get milk', '</li>']
+    assert calls == ['label']
+
+
+def test_nested_fragments_stream():
+    # The outer renderer yields the parts of each nested fragment as is,
+    # rather than a string joined from them
+    page = html_iter'<main>{TodoListIter("High", ["Get milk", "Change tires"])}</main>'
+    assert list(page) == [
+        '<main>', '<ul>',
+        '<li>', 'High', ': ', 'Get milk', '</li>',
+        '<li>', 'High', ': ', 'Change tires', '</li>',
+        '</ul>', '</main>']
+    assert html'<main>{TodoIter("High", "Get milk")}</main>' == '<main><li>High: Get milk</li></main>'
+
+
 def test_sanitize():
     # NOTE this string is not encoded with the html tag, which is used for
     # source code, instead this is supposed to be representative of user
@@ -87,3 +117,116 @@ def test_dynamic_attribute():
     alert = HTML('alert("Clicked!");')
     assert html'<div on{action}="{alert}"/>' == \
         '<div onclick="alert(&quot;Clicked!&quot;);"></div>'
+
+
+def test_call_site_cache():
+    def Item(label):
+        return html'<li>{label}</li>'
+
+    assert Item('a') == '<li>a</li>'
+    sites = len(get_template_cache().sites)
+    assert Item('<b>') == '<li>&lt;b&gt;</li>'
+    assert len(get_template_cache().sites) == sites
+
+
+def test_call_site_cache_distinguishes_formatspecs():
+    # Both templates share the same static strings, which are constants of
+    # this code object, so only the formatspec distinguishes the call sites
+    num = 1.5
+    assert html'<div>{num}</div>' == '<div>1.5</div>'
+    assert html'<div>{num:.2f}</div>' == '<div>1.50</div>'
+
+
+def test_multiple_top_level_nodes():
+    name = 'World'
+    assert html"""
+        <h1>Greeting</h1>
+        <p>Hello, {name}</p>
+    """ == """
+        <h1>Greeting</h1>
+        <p>Hello, World</p>
+    """
+
+
+def test_async_fragment_in_sync_template():
+    fragment = html_aiter'<p>async</p>'
+    with pytest.raises(TypeError):
+        list(html_iter'<div>{fragment}</div>')
+
+
+def test_chunks():
+    page = html_iter"""<html><head><title>{'Todos'}</title></head>{FLUSH}<body>
+        {TodoListIter('High', ['Get milk', 'Change tires'])}
+    </body></html>"""
+    text = ''.join(page)
+    assert list(page.chunks()) == [
+        '<html><head><title>Todos</title></head>', text[len('<html><head><title>Todos</title></head>'):]]
+
+    chunks = list(page.chunks(16))
+    assert ''.join(chunks) == text
+    assert all(len(chunk) >= 16 for chunk in chunks[1:-1])
+
+
+def test_chunks_encoded():
+    label = 'Café'
+    chunks = list(html_iter'<p>{label}</p><p>{label}</p>'.chunks(8, 'utf-8'))
+    assert chunks == [b'<p>Caf\xc3\xa9', b'</p><p>Caf\xc3\xa9', b'</p>']
+
+
+def test_html_bytes():
+    assert html_bytes'<ul>{TodoListIter("High", ["Café"])}</ul>' == \
+        '<ul><ul><li>High: Café</li></ul></ul>'.encode()
+
+
+def test_nested_html_bytes():
+    label = 'Café'
+    inner = html_bytes'<b>{label}</b>'
+    items = [inner, ' & ', [inner]]
+    assert html_bytes'<div>{inner}</div>' == '<div><b>Café</b></div>'.encode()
+    assert html_bytes'<div>{items}</div>' == '<div><b>Café</b> &amp; <b>Café</b></div>'.encode()
+    with pytest.raises(TypeError):
+        html'<div>{inner}</div>'
+    with pytest.raises(TypeError):
+        list(html_iter'<div>{items}</div>')
+
+
+def test_html_bytes_untrusted():
+    # Only HTMLBytes are markup; other bytes may come from anywhere
+    for blob in [b'<script>alert(1)</script>', bytearray(b'<script>'), [b'<script>']]:
+        with pytest.raises(TypeError):
+            html_bytes'<div>{blob}</div>'
+    assert type(html_bytes'<div></div>') is HTMLBytes
+
+
+def test_conversions():
+    label = 'Café <b>'
+    marked = HTML('<b>bold</b>')
+    assert html'<p>{label!r}</p>' == "<p>&#x27;Café &lt;b&gt;&#x27;</p>"
+    assert html'<p>{label!a:>20}</p>' == "<p>       &#x27;Caf\\xe9 &lt;b&gt;&#x27;</p>"
+    # a conversion results in a plain str, so even HTML is escaped
+    assert html'<p>{marked!s}</p>' == '<p>&lt;b&gt;bold&lt;/b&gt;</p>'
+    assert html'<p title={label!r}>{marked}</p>' == '<p title="&#x27;Café &lt;b&gt;&#x27;"><b>bold</b></p>'
+
+
+def test_attribute_values():
+    disabled, hidden = True, False
+    style = {'color': 'red', 'font-size': '1.5em'}
+    attrs = {'id': 'a', 'checked': True, 'readonly': False}
+    assert html'<input disabled={disabled} hidden={hidden} style={style} {attrs}/>' == \
+        '<input disabled style="color: red; font-size: 1.5em" id="a" checked></input>'
+    empty = {}
+    assert html'<input {empty}/>' == '<input></input>'
+
+
+def test_list_attribute_values():
+    # A list is a value like any other, not parts of the attribute value
+    classes = ['a', 'b']
+    name, suffix = 'data', 'x'
+    attrs = {'class': classes}
+    expected = '<p class="[&#x27;a&#x27;, &#x27;b&#x27;]"></p>'
+    assert html'<p class={classes}></p>' == expected
+    assert ''.join(html_iter'<p class={classes}></p>') == expected
+    assert html_bytes'<p class={classes}></p>' == expected.encode()
+    assert html'<p {attrs}></p>' == expected
+    assert html'<p {name}-{suffix}={classes}></p>' == '<p data-x="[&#x27;a&#x27;, &#x27;b&#x27;]"></p>'
+    assert html'<p class="{name} {suffix}"></p>' == '<p class="data x"></p>'
@@ -0,0 +1,50 @@
+import logging
+
+import pytest
+
+from fdom.codecache import CodeCache
+from fdom.htmlcompiler import HTMLCompiler
+from fdom.instrument import add_compile_listener, log_compiles, remove_compile_listener
+from fdom.templatecache import TemplateCache
+
+
+@pytest.fixture
+def events():
+    events = []
+    listener = add_compile_listener(events.append)
+    yield events
+    remove_compile_listener(listener)
+
+
+def test_compile_event(events, keyed):
+    key = keyed'<div>Hello, {name}</div>'
+    cache = TemplateCache()
+    cache.get(HTMLCompiler, key)
+    cache.get(HTMLCompiler, key)
+
+    [event] = events
+    assert event.compiler is HTMLCompiler
+    assert event.key == key
+    assert event.parse_time > 0
+    assert event.codegen_time > 0
+    assert event.exec_time > 0
+    assert event.code_size > 0
+
+
+def test_compile_event_from_code_cache(events, tmp_path, keyed):
+    key = keyed'<div>Hello</div>'
+    TemplateCache(code_cache=CodeCache(tmp_path)).get(HTMLCompiler, key)
+    TemplateCache(code_cache=CodeCache(tmp_path)).get(HTMLCompiler, key)
+    assert [event.code_size is None for event in events] == [False, True]
+
+
+def test_log_compiles(caplog, keyed):
+    listener = log_compiles()
+    try:
+        with caplog.at_level(logging.DEBUG, logger='fdom.compile'):
+            TemplateCache().get(HTMLCompiler, keyed'<p>Logged</p>')
+    finally:
+        remove_compile_listener(listener)
+    [record] = caplog.records
+    assert record.getMessage().startswith('Compiled HTMLCompiler template in ')
+    assert "'<p>Logged</p>'" in record.getMessage()
@@ -0,0 +1,75 @@
+import sys
+
+import pytest
+
+from fdom import templatecache
+from fdom.astparser import KeyThunk
+from fdom.htmlcompiler import EagerHTMLCompiler, HTMLCompiler
+from fdom.precompile import find_templates, main, make_static_key
+from fdom.taglib import Chunk, Thunk
+from fdom.templatecache import TemplateCache, register_precompiled
+
+
+SOURCE = '''
+from fdom.htmltag import html, html_iter
+
+def Todo(prefix, label):
+    return html'<li class="todo">{prefix!r}: {label:>10}</li>'
+
+def TodoList(prefix, todos):
+    return html_iter"""<ul>
+        {[Todo(prefix, label) for label in todos]}
+    </ul>"""
+
+# html'<p>not a template</p>'
+text = 'html'
+'''
+
+
+def test_make_static_key():
+    assert make_static_key('<div {attrs}>{ {"a": 1}["a"] }</div>') == (
+        Chunk('<div '), KeyThunk(None, None), Chunk('>'), KeyThunk(None, None), Chunk('</div>'))
+    assert make_static_key('{x!r:{width}}') is None
+
+
+def test_find_templates():
+    assert list(find_templates(SOURCE)) == [
+        (5, (Chunk('<li class="todo">'), KeyThunk('r', None), Chunk(': '), KeyThunk(None, '>10'), Chunk('</li>'))),
+        (8, (Chunk('<ul>\n        '), KeyThunk(None, None), Chunk('\n    </ul>'))),
+    ]
+    assert list(find_templates(SOURCE, tags=['html_iter']))[0][0] == 8
+
+
+@pytest.fixture
+def precompiled(tmp_path, monkeypatch):
+    (tmp_path / 'todos.py').write_text(SOURCE)
+    main([str(tmp_path / 'todos.py'), '-o', str(tmp_path / 'precompiled_todos.py')])
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(templatecache, '_precompiled', {})
+    yield __import__('precompiled_todos')
+    del sys.modules['precompiled_todos']
+
+
+def test_precompiled_module(precompiled, monkeypatch):
+    assert len(precompiled.TEMPLATES['fdom.htmlcompiler.HTMLCompiler']) == 2
+    assert len(precompiled.TEMPLATES['fdom.htmlcompiler.EagerHTMLCompiler']) == 2
+    assert len(precompiled.TEMPLATES['fdom.htmlcompiler.AsyncHTMLCompiler']) == 2
+    assert register_precompiled(HTMLCompiler, precompiled)
+    assert register_precompiled(EagerHTMLCompiler, precompiled)
+
+    def fail(*args):
+        raise AssertionError('Template was parsed')
+
+    monkeypatch.setattr(templatecache, 'parse_keyed_template_as_ast', fail)
+    key = next(iter(precompiled.TEMPLATES['fdom.htmlcompiler.HTMLCompiler']))
+    args = [None, Thunk(lambda: 'High', 'prefix', 'r'), None, Thunk(lambda: 'Milk', 'label', None, '>10'), None]
+    compiled_template = TemplateCache().get(HTMLCompiler, key)
+    assert ''.join(compiled_template(args)) == '<li class="todo">&#x27;High&#x27;:       Milk</li>'
+    compiled_template = TemplateCache().get(EagerHTMLCompiler, key)
+    assert compiled_template(args) == '<li class="todo">&#x27;High&#x27;:       Milk</li>'
+
+
+def test_precompiled_version_mismatch(precompiled):
+    precompiled.FDOM_VERSION = 'other'
+    with pytest.warns(UserWarning):
+        assert not register_precompiled(HTMLCompiler, precompiled)
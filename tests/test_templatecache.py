@@ -0,0 +1,137 @@
+import gc
+import threading
+import time
+import weakref
+
+from fdom import templatecache
+from fdom.astparser import KeyThunk
+from fdom.fdomcompiler import FdomCompiler
+from fdom.htmlcompiler import HTMLCompiler
+from fdom.taglib import Chunk
+from fdom.templatecache import TemplateCache
+
+
+def test_hits_and_misses(keyed):
+    cache = TemplateCache()
+    key = keyed'<div>Hello</div>'
+    first = cache.get(HTMLCompiler, key)
+    assert cache.get(HTMLCompiler, key) is first
+    info = cache.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 1, 1)
+    assert info.compile_time > 0
+
+
+def test_eviction(keyed):
+    cache = TemplateCache(maxsize=2)
+    keys = [keyed'<p>a</p>', keyed'<p>b</p>', keyed'<p>c</p>']
+    for key in keys:
+        cache.get(HTMLCompiler, key)
+    assert cache.cache_info().evictions == 1
+    assert cache.keys() == keys[1:]
+
+
+def test_lru_order(keyed):
+    cache = TemplateCache(maxsize=2)
+    a, b, c = keyed'<p>a</p>', keyed'<p>b</p>', keyed'<p>c</p>'
+    cache.get(HTMLCompiler, a)
+    cache.get(HTMLCompiler, b)
+    cache.get(HTMLCompiler, a)
+    cache.get(HTMLCompiler, c)
+    assert cache.keys() == [a, c]
+
+
+def test_warm_and_clear():
+    cache = TemplateCache()
+    key = (Chunk('<li>'), KeyThunk(), Chunk('</li>'))
+    cache.warm(HTMLCompiler, key)
+    assert cache.cache_info().misses == 0
+    assert len(cache) == 1
+
+    cache.get(HTMLCompiler, key)
+    assert cache.cache_info().hits == 1
+
+    cache.clear()
+    assert cache.cache_info() == (0, 0, cache.maxsize, 0, 0, 0, 0.0)
+
+
+def test_lookup_call_site(keyed):
+    cache = TemplateCache()
+
+    def Item(label):
+        return keyed'<li>{label}</li>'
+
+    def lookup(*args):
+        return cache.lookup(HTMLCompiler, args)
+
+    def render_item(label):
+        compiled_template, args = lookup'<li>{label}</li>'
+        return ''.join(compiled_template(args))
+
+    assert render_item('a') == '<li>a</li>'
+    assert render_item('b & c') == '<li>b &amp; c</li>'
+    assert len(cache.sites) == 1
+    assert cache.keys() == [Item('a')]
+    assert cache.cache_info()[:2] == (1, 1)
+
+
+def test_lookup_does_not_keep_values():
+    cache = TemplateCache()
+
+    class Label:
+        def __str__(self):
+            return 'a'
+
+    def lookup(*args):
+        return cache.lookup(HTMLCompiler, args)
+
+    def render_item(label):
+        compiled_template, args = lookup'<li>{label}</li>'
+        return ''.join(compiled_template(args))
+
+    label = Label()
+    ref = weakref.ref(label)
+    assert render_item(label) == '<li>a</li>'
+    del label
+    gc.collect()
+    assert ref() is None
+    assert len(cache.sites) == 1
+
+
+def test_shared_across_compilers(keyed):
+    cache = TemplateCache()
+    key = keyed'<div>Hello</div>'
+    cache.get(HTMLCompiler, key)
+    cache.get(FdomCompiler, key)
+    assert len(cache) == 2
+    assert cache.keys(HTMLCompiler) == [key]
+    assert cache.keys(FdomCompiler) == [key]
+
+
+def test_single_flight(monkeypatch, keyed):
+    parses = []
+
+    def slow_parse(*keyed_args):
+        parses.append(keyed_args)
+        time.sleep(0.05)
+        return parse(*keyed_args)
+
+    parse = templatecache.parse_keyed_template_as_ast
+    monkeypatch.setattr(templatecache, 'parse_keyed_template_as_ast', slow_parse)
+    cache = TemplateCache()
+    key = keyed'<footer>Slow</footer>'
+    barrier = threading.Barrier(8)
+    results = []
+
+    def request():
+        barrier.wait()
+        results.append(cache.get(HTMLCompiler, key))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(parses) == 1
+    assert len(results) == 8 and all(result is results[0] for result in results)
+    assert cache.cache_info().currsize == 1
+    assert len(cache.compiling) == 0
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from fdom.htmlcompiler import EagerHTMLCompiler, HTML
+from fdom.templatecache import TemplateCache, get_template_cache, set_template_cache
+from fdom.templatehandle import template
+
+
+def test_render_many():
+    # The expressions only name the interpolations, so are never evaluated
+    row = template'<tr class={cls}><td>{name}</td><td>{price:.2f}</td></tr>'
+    assert row.render_many([('odd', 'Milk & eggs', 1.5), ('even', HTML('<b>Tea</b>'), 3)]) == (
+        '<tr class="odd"><td>Milk &amp; eggs</td><td>1.50</td></tr>'
+        '<tr class="even"><td><b>Tea</b></td><td>3.00</td></tr>')
+    assert row.render_many([]) == ''
+
+
+def test_iter_many():
+    item = template'<li>{label!r}</li>'
+    assert list(item.iter_many([('a',), ('b',)])) == [
+        '<li>', '&#x27;a&#x27;', '</li>', '<li>', '&#x27;b&#x27;', '</li>']
+
+
+def test_wrong_number_of_values():
+    item = template'<li>{label}</li>'
+    with pytest.raises(ValueError):
+        item.render_many([('a', 'b')])
+
+
+def test_render():
+    item = template'<li class={cls}>{label}</li>'
+    assert item.render('done', 'Milk & eggs') == '<li class="done">Milk &amp; eggs</li>'
+    assert item.bytes('done', 'Café') == '<li class="done">Café</li>'.encode()
+    assert ''.join(item.iter('todo', 'Tea')) == '<li class="todo">Tea</li>'
+
+
+def test_cache_cleared():
+    item = template'<li>{label}</li>'
+    cache = get_template_cache()
+    assert item.render('Tea') == '<li>Tea</li>'
+    cache.clear()
+    assert item.render('Tea') == '<li>Tea</li>'
+    assert cache.cache_info().misses == 1
+    assert (EagerHTMLCompiler, item.keyed_args) in cache.entries
+
+    other = TemplateCache()
+    set_template_cache(other)
+    try:
+        assert item.render('Tea') == '<li>Tea</li>'
+        assert len(other) == 1
+    finally:
+        set_template_cache(cache)
+
+
+def test_render_reentrant():
+    # A value rendered lazily with the same handle, while it is rendering
+    item = template'<li>{label}{children}</li>'
+
+    class Children:
+        def __iter__(self):
+            yield item.render('inner', '')
+
+    assert item.render('outer', Children()) == '<li>outer<li>inner</li></li>'
+    assert item.render('again', '') == '<li>again</li>'
+    assert len(item.idle) == 2
+
+
+def test_render_async():
+    item = template'<li>{label}</li>'
+
+    async def collect():
+        return ''.join([part async for part in item.aiter('Tea')])
+
+    assert asyncio.run(collect()) == '<li>Tea</li>'
+
+
+def test_live():
+    row = template'<tr class={cls}><td>{name}</td><td>{cells}</td></tr>'
+
+    class Cells:
+        renders = 0
+
+        def __iter__(self):
+            Cells.renders += 1
+            yield HTML('<b>1</b>')
+
+    cells = Cells()
+    live = row.live('odd', 'Milk', cells)
+    assert live.render() == '<tr class="odd"><td>Milk</td><td><b>1</b></td></tr>'
+    assert live.update('even', 'Milk & eggs', cells) == '<tr class="even"><td>Milk &amp; eggs</td><td><b>1</b></td></tr>'
+    assert Cells.renders == 1
+    assert live.update('even', 'Tea', 1) == '<tr class="even"><td>Tea</td><td>1</td></tr>'
+    # 1 == True, but renders differently
+    assert live.update('even', 'Tea', True) == '<tr class="even"><td>Tea</td><td>True</td></tr>'
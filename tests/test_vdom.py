@@ -0,0 +1,105 @@
+import pytest
+
+from fdom.fdom_htmltag import html
+from fdom.vdom import Attribute, Children, Element, Rendered, diff, patch, to_html
+
+
+def Item(id, label, status):
+    return html'<li key={id} class={status}>{label}</li>'
+
+
+def Page(title, items):
+    return html'<h1>{title}</h1><ul class="items">{[Item(*item) for item in items]}</ul><p>Static</p>'
+
+
+def test_render():
+    page = Page('Todo', [(1, 'Milk & eggs', 'done'), (2, 'Tea', False)])
+    assert isinstance(page, Rendered)
+    assert to_html(page) == (
+        '<h1>Todo</h1><ul class="items"><li class="done">Milk &amp; eggs</li><li>Tea</li></ul><p>Static</p>')
+    item = page.nodes[1].children[0][0]
+    assert item.nodes == [Element('li', {'class': 'done'}, [['Milk & eggs']], key=1)]
+    assert item.values == [1, 'done', 'Milk & eggs']
+
+
+def test_static_subtrees_shared():
+    first = Page('a', [])
+    second = Page('b', [])
+    assert first.nodes[2] is second.nodes[2]
+    assert first.nodes[2] == Element('p', {}, ['Static'])
+
+
+def test_diff_only_changed_slots():
+    page = Page('Todo', [(1, 'Milk', 'done'), (2, 'Tea', False)])
+    changes = diff(page, Page('Todo', [(1, 'Milk', 'done'), (2, 'Tea', 'done')]))
+    tea = page.nodes[1].children[0][1]
+    assert changes == [(tea, 1, 'done', None)]
+    target = tea.targets[1]
+    assert target.__class__ is Attribute and (target.element, target.name) == (tea.nodes[0], 'class')
+
+    patch(changes)
+    assert to_html(page) == (
+        '<h1>Todo</h1><ul class="items"><li class="done">Milk</li><li class="done">Tea</li></ul><p>Static</p>')
+    assert diff(page, Page('Todo', [(1, 'Milk', 'done'), (2, 'Tea', 'done')])) == []
+
+
+def test_keyed_children():
+    page = Page('Todo', [(1, 'Milk', False), (2, 'Tea', False)])
+    milk, tea = page.nodes[1].children[0]
+    new = Page('Todo', [(3, 'Eggs', False), (2, 'Tea', 'done'), (1, 'Milk', False)])
+    changes = diff(page, new)
+    assert [(change.rendered, change.slot) for change in changes] == [(tea, 1), (page, 1)]
+
+    patch(changes)
+    assert page == new
+    eggs, tea_after, milk_after = page.nodes[1].children[0]
+    assert tea_after is tea and milk_after is milk
+    assert page.targets[1] == Children(page.nodes[1].children[0])
+
+
+def test_dynamic_tag_and_spread_attributes():
+    def Heading(level, attrs, title):
+        return html'<h{level} {attrs}>{title!r}</h{level}>'
+
+    heading = Heading(1, {'id': 'top', 'hidden': True}, 'Hi')
+    assert to_html(heading) == "<h1 id=\"top\" hidden>&#x27;Hi&#x27;</h1>"
+    patch(diff(heading, Heading(2, {'class': 'small'}, 'Hi')))
+    assert to_html(heading) == "<h2 class=\"small\">&#x27;Hi&#x27;</h2>"
+    assert heading.values == ['h2', {'class': 'small'}, "'Hi'"]
+
+
+def test_patch_attributes_overridden_by_spread():
+    def Box(attrs, title):
+        return html'<div class="box" {attrs} title={title}>x</div>'
+
+    for old, new in [
+        ({'class': 'wide'}, {}),
+        ({'title': 'a'}, {}),
+        ({}, {'class': 'wide', 'title': 'a'}),
+        ({'id': 'b', 'hidden': True}, {'id': 'c', 'class': False}),
+    ]:
+        box = Box(old, 't')
+        patch(diff(box, Box(new, 't')))
+        assert to_html(box) == to_html(Box(new, 't'))
+        assert box == Box(new, 't')
+
+    box = Box({'class': 'wide'}, 't')
+    patch(diff(box, Box({}, 'u')))
+    assert to_html(box) == '<div class="box" title="u">x</div>'
+
+
+def test_patch_attribute_overriding_spread():
+    def Box(attrs, title):
+        return html'<div {attrs} title={title} class="box">x</div>'
+
+    box = Box({'title': 'a', 'class': 'wide'}, False)
+    assert to_html(box) == '<div title="a" class="box">x</div>'
+    patch(diff(box, Box({'title': 'a', 'class': 'wide'}, 't')))
+    assert to_html(box) == '<div title="t" class="box">x</div>'
+    patch(diff(box, Box({'title': 'a'}, False)))
+    assert to_html(box) == '<div title="a" class="box">x</div>'
+
+
+def test_diff_different_templates():
+    with pytest.raises(ValueError):
+        diff(Item(1, 'Milk', False), Page('Todo', []))